@@ -1,43 +1,409 @@
-def reformat_to_paragraphs(input_text, max_line_length=9000):
+import argparse
+import codecs
+import glob
+import mmap
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import groupby
+
+CHUNK_SIZE = 1 << 20  # characters read per step when streaming
+SPLIT_SIZE = 64 << 20  # batch mode: files larger than this are cut into pieces for several workers
+OUTPUT_SUFFIX = "_paragraphs.txt"
+
+# A whitespace-only line between two line feeds. In UTF-8 (and other ASCII-compatible
+# encodings) b"\n" never occurs inside a multi-byte character, so cutting here is safe;
+# see byte_splittable() for the encodings where it is not.
+_BLANK_LINE_RE = re.compile(rb"\n[ \t\r\v\f]*\n")
+
+ENGINES = ("lines", "bytes")
+# Characters that str.splitlines()/str.strip() treat as line breaks or whitespace but
+# bytes.splitlines()/bytes.strip() do not (or the other way round), as UTF-8:
+# \v \f \x1c-\x1f, U+0085, U+00A0, U+1680, U+2000-U+200A, U+2028, U+2029, U+202F, U+205F, U+3000
+_BYTES_ASCII_BLOCKERS = (b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e", b"\x1f")
+# Keyed by lead byte: single-byte "in" is a memchr, multi-byte needles are only searched if it hits
+_BYTES_UTF8_BLOCKERS = {
+    b"\xc2": re.compile(rb"\xc2[\x85\xa0]"),
+    b"\xe1": re.compile(rb"\xe1\x9a\x80"),
+    b"\xe2": re.compile(rb"\xe2(?:\x80[\x80-\x8a\xa8\xa9\xaf]|\x81\x9f)"),
+    b"\xe3": re.compile(rb"\xe3\x80\x80"),
+}
+
+
+def reformat_to_paragraphs(input_text, max_line_length=9000, engine="lines"):
     """
     Reformat text into paragraph form only.
     Keeps all words, does not add/remove anything.
     Joins broken lines into full paragraphs based on blank lines.
+    engine="bytes" runs the same transformation on the UTF-8 bytes (see reformat_bytes_to_paragraphs).
     """
-    # Split into lines
-    lines = input_text.splitlines()
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+    if engine == "bytes":
+        try:
+            data = input_text.encode("utf-8")
+        except UnicodeEncodeError:  # lone surrogates; only the str engine can take them
+            pass
+        else:
+            return reformat_bytes_to_paragraphs(data).decode("utf-8")
+    # Split into lines, join them into paragraphs, and join paragraphs with double newlines
+    return "\n\n".join(iter_paragraphs(input_text.splitlines()))
+
 
-    paragraphs = []
+def bytes_engine_applies(data, encoding="utf-8"):
+    """
+    True if reformatting the raw bytes gives exactly what the str engine gives for the decoded text:
+    UTF-8 input that contains none of the line breaks/whitespace only str knows about.
+    Raises UnicodeDecodeError for invalid UTF-8, like decoding for the str engine would.
+    """
+    if codecs.lookup(encoding).name != "utf-8":
+        return False
+    if any(b in data for b in _BYTES_ASCII_BLOCKERS):
+        return False
+    if data.isascii():
+        return True
+    data.decode("utf-8")
+    return not any(lead in data and pattern.search(data) for lead, pattern in _BYTES_UTF8_BLOCKERS.items())
+
+
+def reformat_bytes_to_paragraphs(data, encoding="utf-8"):
+    """
+    reformat_to_paragraphs for encoded text: bytes in, bytes out, same result.
+    Skips decoding/encoding and works on 1-byte-per-character lines, which matters most for
+    non-ASCII transcripts (a str holding any such character stores every character in 2-4 bytes).
+    Falls back to the str engine when bytes_engine_applies() says no.
+    """
+    if not bytes_engine_applies(data, encoding):
+        return reformat_to_paragraphs(data.decode(encoding)).encode(encoding)
+    # Strip every line in C, group runs of non-empty lines, one join per paragraph
+    space = b" ".join
+    return b"\n\n".join(space(lines) for keep, lines in groupby(map(bytes.strip, data.splitlines()), bool) if keep)
+
+
+def iter_paragraphs(lines):
+    """
+    Yield paragraphs from an iterable of lines as soon as a blank line closes them.
+    Same rules as reformat_to_paragraphs: lines are stripped and joined with a space.
+    """
     current_paragraph = []
 
     for line in lines:
+        stripped = line.strip()
         # If line is empty, close current paragraph
-        if not line.strip():
+        if not stripped:
             if current_paragraph:
-                paragraphs.append(" ".join(current_paragraph))
+                yield " ".join(current_paragraph)
                 current_paragraph = []
         else:
             # Append line to current paragraph
-            current_paragraph.append(line.strip())
+            current_paragraph.append(stripped)
 
-    # Append last paragraph if any
+    # Last paragraph if any
     if current_paragraph:
-        paragraphs.append(" ".join(current_paragraph))
+        yield " ".join(current_paragraph)
 
-    # Join paragraphs with double newlines
-    return "\n\n".join(paragraphs)
 
+def iter_lines(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yield the lines of a text stream exactly as str.splitlines() would split the whole text,
+    reading chunk_size characters at a time. Open files with newline="" so "\r\n" reaches
+    splitlines unchanged (the result is the same either way).
+    """
+    carry = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        text = carry + chunk
+        # The last piece may be an unfinished line, or a "\r" whose "\n" is in the next chunk
+        carry = text.splitlines(keepends=True)[-1]
+        yield from text[:len(text) - len(carry)].splitlines()
+    if carry:
+        yield from carry.splitlines()
+
+
+def iter_paragraphs_from_stream(stream, chunk_size=CHUNK_SIZE):
+    """Generator of finished paragraphs read incrementally from a text stream."""
+    return iter_paragraphs(iter_lines(stream, chunk_size))
+
+
+def reformat_stream(src, dst, chunk_size=CHUNK_SIZE):
+    """
+    Streaming reformat_to_paragraphs: read src incrementally and write the same output to dst.
+    Lines are written as they arrive, so memory stays constant even for one huge paragraph.
+    """
+    wrote_any = False
+    in_paragraph = False
+    for line in iter_lines(src, chunk_size):
+        stripped = line.strip()
+        if not stripped:
+            in_paragraph = False
+            continue
+        if in_paragraph:
+            dst.write(" ")
+        elif wrote_any:
+            dst.write("\n\n")
+        dst.write(stripped)
+        in_paragraph = wrote_any = True
+
+
+# -------- Batch mode (many files, mmap, process pool) --------
+def output_path_for(path):
+    return os.path.splitext(path)[0] + OUTPUT_SUFFIX
+
+
+def expand_inputs(patterns, ext=".txt"):
+    """Files from glob patterns, directories (walked for *ext) and plain paths; earlier outputs are skipped."""
+    found = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = []
+            for dirpath, _dirnames, filenames in os.walk(pattern):
+                candidates.extend(os.path.join(dirpath, n) for n in sorted(filenames) if n.lower().endswith(ext))
+        elif glob.has_magic(pattern):
+            candidates = sorted(glob.glob(pattern, recursive=True))
+        else:
+            candidates = [pattern]
+        for path in candidates:
+            if os.path.isfile(path) and not path.endswith(OUTPUT_SUFFIX) and os.path.abspath(path) not in seen:
+                seen.add(os.path.abspath(path))
+                found.append(path)
+    return found
+
+
+def byte_splittable(encoding):
+    """True if encoding writes "\n" as the single byte b"\n", so files can be cut at blank lines bytewise."""
+    return "\n".encode(encoding) == b"\n"
 
-# Example usage:
-if __name__ == "__main__":
-    # Load from file (example: transcript.txt)
-    with open("transcript.txt", "r", encoding="utf-8") as f:
-        text = f.read()
 
-    formatted = reformat_to_paragraphs(text)
+def split_points(mm, size, split_size):
+    """
+    Byte ranges of mm, each about split_size long, cut only inside blank lines.
+    No paragraph crosses a cut, so the pieces can be reformatted independently and their
+    outputs joined with a blank line, giving the same result as the whole file.
+    """
+    ranges = []
+    start = 0
+    while size - start > split_size:
+        m = _BLANK_LINE_RE.search(mm, start + split_size)
+        if not m:
+            break
+        ranges.append((start, m.start() + 1))
+        start = m.end()
+    ranges.append((start, size))
+    return ranges
+
+
+def _reformat_range(path, start, end, encoding, engine="lines"):
+    """
+    Reformat bytes [start, end) of path (memory-mapped) and return the encoded output,
+    with the same newline translation a text-mode write would apply.
+    """
+    if end <= start:
+        return b""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = mm[start:end]
+    if engine == "bytes":
+        out = reformat_bytes_to_paragraphs(data, encoding)
+    else:
+        out = reformat_to_paragraphs(data.decode(encoding)).encode(encoding)
+    if os.linesep != "\n":
+        out = out.replace("\n".encode(encoding), os.linesep.encode(encoding))
+    return out
+
+
+def _atomic_write(out_path, data):
+    """Write next to out_path, then rename over it, so readers never see a half-written file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_path)), suffix=".tmp")
+    try:
+        with open(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _batch_whole_file(path, encoding, engine):
+    """Pool worker: one small file, start to finish."""
+    size = os.path.getsize(path)
+    _atomic_write(output_path_for(path), _reformat_range(path, 0, size, encoding, engine))
+    return size
+
+
+def _batch_piece(path, start, end, part_path, encoding, engine):
+    """Pool worker: one piece of a large file, written to its own part file."""
+    with open(part_path, "wb") as f:
+        f.write(_reformat_range(path, start, end, encoding, engine))
+    return end - start
+
+
+def _join_parts(out_path, part_paths, encoding):
+    """Concatenate piece outputs in order with a blank line between non-empty ones, atomically."""
+    separator = (os.linesep * 2).encode(encoding)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_path)), suffix=".tmp")
+    try:
+        with open(fd, "wb") as out:
+            wrote_any = False
+            for part in part_paths:
+                with open(part, "rb") as f:
+                    first = f.read(1)
+                    if not first:
+                        continue
+                    if wrote_any:
+                        out.write(separator)
+                    out.write(first)
+                    shutil.copyfileobj(f, out)
+                    wrote_any = True
+        os.replace(tmp, out_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    finally:
+        for part in part_paths:
+            if os.path.exists(part):
+                os.unlink(part)
+
+
+def reformat_batch(paths, workers=None, split_size=SPLIT_SIZE, encoding="utf-8", engine="lines", log=print):
+    """
+    Reformat many files across a process pool; each result lands atomically next to its input
+    as <name>_paragraphs.txt. Files above split_size are cut at blank lines (found via mmap)
+    so one big file keeps several workers busy, if byte_splittable(encoding). Returns a summary dict.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+    workers = workers or os.cpu_count() or 1
+    # UTF-16/32 and the like: a byte-level cut could land inside a code unit, so files stay whole
+    splittable = byte_splittable(encoding)
+    t0 = time.time()
+    summary = {"files": 0, "failed": 0, "bytes": 0, "seconds": 0.0}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}   # future -> input path
+        pieces = {}    # path -> [remaining piece count, part paths]
+        for path in paths:
+            size = os.path.getsize(path)
+            if size <= split_size or not splittable:
+                futures[pool.submit(_batch_whole_file, path, encoding, engine)] = path
+                continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                ranges = split_points(mm, size, split_size)
+            out_dir = os.path.dirname(os.path.abspath(path))
+            parts = [os.path.join(out_dir, f".{os.path.basename(path)}.part{i:04d}.tmp") for i in range(len(ranges))]
+            pieces[path] = [len(ranges), parts]
+            for (start, end), part in zip(ranges, parts):
+                futures[pool.submit(_batch_piece, path, start, end, part, encoding, engine)] = path
+
+        failed = set()
+        for fut in as_completed(futures):
+            path = futures[fut]
+            try:
+                nbytes = fut.result()
+            except Exception as e:
+                if path not in failed:
+                    failed.add(path)
+                    log(f"FAILED {path}: {e}")
+                nbytes = 0
+            summary["bytes"] += nbytes
+
+            if path in pieces:
+                pieces[path][0] -= 1
+                if pieces[path][0]:
+                    continue
+                parts = pieces.pop(path)[1]
+                if path in failed:
+                    for part in parts:
+                        if os.path.exists(part):
+                            os.unlink(part)
+                    continue
+                _join_parts(output_path_for(path), parts, encoding)
+            if path not in failed:
+                summary["files"] += 1
+
+    summary["failed"] = len(failed)
+    summary["seconds"] = time.time() - t0
+    return summary
+
+
+def format_batch_summary(summary):
+    secs = summary["seconds"] or 1e-9
+    mb = summary["bytes"] / (1024 * 1024)
+    return (f"Reformatted {summary['files']} file(s), {summary['failed']} failed, {mb:.1f} MB in {secs:.2f}s: "
+            f"{summary['files'] / secs:.1f} files/s, {mb / secs:.1f} MB/s")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Join broken transcript lines into paragraphs.")
+    p.add_argument("inputs", nargs="*", default=["transcript.txt"],
+                   help="One file or - for stdin (streamed), or several files / globs / folders (batch mode). "
+                        "Default: transcript.txt")
+    p.add_argument("-o", "--output", help="Single-file mode: output file, or - for stdout "
+                                          "(default: <input>_paragraphs.txt, stdout for stdin)")
+    p.add_argument("--encoding", default="utf-8", help="Text encoding for input and output (default: utf-8)")
+    p.add_argument("--batch", action="store_true", help="Use batch mode even for a single file")
+    p.add_argument("-j", "--workers", type=int, help="Batch mode: worker processes (default: CPU count)")
+    p.add_argument("--split-size", type=int, default=SPLIT_SIZE >> 20, metavar="MB",
+                   help="Batch mode: split files larger than this at blank lines (default: %(default)s)")
+    p.add_argument("--ext", default=".txt", help="Batch mode: extension to pick up in folders (default: .txt)")
+    p.add_argument("--engine", choices=ENGINES, default="lines",
+                   help="Batch mode: reformat decoded lines (str) or raw UTF-8 bytes; same output (default: lines)")
+    args = p.parse_args(argv)
 
-    # Save to new file
-    with open("transcript_paragraphs.txt", "w", encoding="utf-8") as f:
-        f.write(formatted)
+    single = len(args.inputs) == 1 and not args.batch and (args.inputs[0] == "-" or os.path.isfile(args.inputs[0]))
+    if not single and len(args.inputs) == 1 and not args.batch and not os.path.exists(args.inputs[0]) \
+            and not glob.has_magic(args.inputs[0]):
+        p.error(f"input file not found: {args.inputs[0]}")
 
-    print("Reformatted text saved as transcript_paragraphs.txt")
+    if not single:
+        if args.output:
+            p.error("-o/--output only applies to a single input; batch outputs go next to each input")
+        paths = expand_inputs(args.inputs, args.ext)
+        if not paths:
+            p.error("no input files found")
+        summary = reformat_batch(paths, workers=args.workers, split_size=args.split_size << 20,
+                                 encoding=args.encoding, engine=args.engine)
+        print(format_batch_summary(summary))
+        return 1 if summary["failed"] else 0
+
+    in_path = args.inputs[0]
+    out_path = args.output
+    if out_path is None:
+        out_path = "-" if in_path == "-" else output_path_for(in_path)
+
+    if in_path == "-":
+        src = open(sys.stdin.fileno(), "r", encoding=args.encoding, newline="", closefd=False)
+    else:
+        src = open(in_path, "r", encoding=args.encoding, newline="")
+    if out_path == "-":
+        with src, open(sys.stdout.fileno(), "w", encoding=args.encoding, closefd=False) as dst:
+            reformat_stream(src, dst)
+        return 0
+
+    # Stream into a temp file next to the output and rename it over the output at the end,
+    # so -o naming the input (or a failed run) never truncates a file that is still needed
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_path)), suffix=".tmp")
+    try:
+        with src, open(fd, "w", encoding=args.encoding) as dst:
+            reformat_stream(src, dst)
+        os.replace(tmp, out_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    print(f"Reformatted text saved as {out_path}")
+    return 0
+
+
+# Example usage:
+#   python TextFormatter.py                       (transcript.txt -> transcript_paragraphs.txt)
+#   python TextFormatter.py dump.txt -o out.txt
+#   cat dump.txt | python TextFormatter.py - > out.txt
+#   python TextFormatter.py "nightly/**/*.txt" archive/ -j 8   (batch, outputs next to inputs)
+if __name__ == "__main__":
+    sys.exit(main())
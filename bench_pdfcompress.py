@@ -0,0 +1,117 @@
+#pip install pymupdf pillow
+# Micro-benchmark for the page -> JPEG step of pdfcompress.
+# Compares the old PIL round trip (pix.samples copy -> Image.frombytes -> convert -> BytesIO)
+# with the current path (render in the target colorspace, Pillow reads the pixmap buffer in place)
+# and with MuPDF's own JPEG writer. Each path runs in a fresh process so its peak RSS, which
+# includes MuPDF's and Pillow's C buffers (pixmaps, JPEG output), is measured on its own.
+#
+#   python bench_pdfcompress.py some.pdf --pages 10 --dpi 144 --grayscale
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from pdfcompress import render_page_jpeg
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None when the platform gives no way to read it."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1048576 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB elsewhere
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss) / 1048576  # peak working set on Windows
+
+def format_mb(mb, width):
+    return f"{'n/a':>{width + 3}}" if mb is None else f"{mb:>{width}.0f} MB"
+
+def legacy_render_page_jpeg(page, mat, jpeg_quality, grayscale):
+    """The original loop body of compress_pdf_raster, kept here as the baseline."""
+    pix = page.get_pixmap(matrix=mat, alpha=False)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    if grayscale:
+        img = img.convert("L")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=jpeg_quality, optimize=True)
+    return buf.getvalue()
+
+PATHS = {
+    "legacy (PIL round trip)": legacy_render_page_jpeg,
+    "pil (in-place buffer)": lambda page, mat, q, gray: render_page_jpeg(page, mat, q, gray, "pil"),
+    "fitz (MuPDF writer)": lambda page, mat, q, gray: render_page_jpeg(page, mat, q, gray, "fitz"),
+}
+
+def run_child(pdf, name, pages, dpi, jpeg_quality, grayscale, repeat):
+    """Runs inside the measured process: (ms per page, peak RSS growth, peak RSS, jpeg bytes per page)."""
+    fn = PATHS[name]
+    doc = fitz.open(pdf)
+    indices = list(range(min(pages, len(doc))))
+    zoom = dpi / 72.0
+    mat = fitz.Matrix(zoom, zoom)
+    baseline = peak_rss_mb()
+
+    # Warm-up so fonts/images are already in MuPDF's store for every path
+    out_bytes = 0
+    for i in indices:
+        out_bytes += len(fn(doc[i], mat, jpeg_quality, grayscale))
+
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for i in indices:
+            fn(doc[i], mat, jpeg_quality, grayscale)
+        best = min(best, time.perf_counter() - t0)
+
+    peak = peak_rss_mb()
+    n = len(indices)
+    print(json.dumps({
+        "pages": n,
+        "ms_per_page": best / n * 1000,
+        "rss_growth_mb": None if peak is None else peak - baseline,
+        "max_rss_mb": peak,
+        "jpeg_per_page": out_bytes / n,
+    }))
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark page rendering + JPEG encoding paths.")
+    p.add_argument("pdf", help="PDF to sample pages from")
+    p.add_argument("--pages", type=int, default=10, help="Number of pages to use (default 10)")
+    p.add_argument("--dpi", type=int, default=144)
+    p.add_argument("-q", "--quality", type=int, default=70)
+    p.add_argument("--grayscale", action="store_true")
+    p.add_argument("--repeat", type=int, default=3, help="Timing runs; the best one is reported")
+    p.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        run_child(args.pdf, args.child, args.pages, args.dpi, args.quality, args.grayscale, args.repeat)
+        return
+
+    print(f"Up to {args.pages} page(s) at {args.dpi} dpi, quality {args.quality}{', grayscale' if args.grayscale else ''}")
+    print(f"{'path':<26}{'ms/page':>10}{'RSS growth':>13}{'peak RSS':>12}{'jpeg/page':>12}")
+    for name in PATHS:
+        cmd = [sys.executable, os.path.abspath(__file__), args.pdf, "--child", name, "--pages", str(args.pages),
+               "--dpi", str(args.dpi), "-q", str(args.quality), "--repeat", str(args.repeat)]
+        if args.grayscale:
+            cmd.append("--grayscale")
+        res = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        r = json.loads(res.stdout.strip().splitlines()[-1])
+        print(f"{name:<26}{r['ms_per_page']:>10.1f}{format_mb(r['rss_growth_mb'], 10)}{format_mb(r['max_rss_mb'], 9)}"
+              f"{r['jpeg_per_page'] / 1024:>9.0f} KB")
+
+if __name__ == "__main__":
+    main()
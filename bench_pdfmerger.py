@@ -0,0 +1,126 @@
+#pip install pypdf
+# Memory/time benchmark for pdfmerger.merge_pdfs: classic PdfWriter vs --streaming vs --dedup.
+# Generates N small "statement" PDFs (unique text, shared logo image) and merges them,
+# each run in a fresh process so peak RSS is per run.
+#
+#   python bench_pdfmerger.py --sizes 100 1000 10000
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from pypdf import PdfWriter
+from pypdf.generic import (
+    DecodedStreamObject, DictionaryObject, EncodedStreamObject, NameObject, NumberObject,
+)
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None when the platform gives no way to read it."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1048576 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB elsewhere
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss) / 1048576  # peak working set on Windows
+
+def format_mb(mb, width):
+    return f"{'n/a':>{width + 3}}" if mb is None else f"{mb:>{width}.0f} MB"
+
+def make_statement(path, n, logo_data):
+    """One-page PDF with a Helvetica text block and a 64x64 RGB logo."""
+    writer = PdfWriter()
+    page = writer.add_blank_page(width=595, height=842)
+
+    logo = EncodedStreamObject()
+    logo._data = logo_data
+    logo.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(64),
+        NameObject("/Height"): NumberObject(64),
+        NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+        NameObject("/Filter"): NameObject("/FlateDecode"),
+    })
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+        NameObject("/XObject"): DictionaryObject({NameObject("/Logo"): writer._add_object(logo)}),
+    })
+
+    lines = [f"Statement {n}"] + [f"Line {i}: amount {n * 31 + i * 7} EUR" for i in range(40)]
+    text = "BT /F1 11 Tf 72 760 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+    content = DecodedStreamObject()
+    content.set_data(f"q 64 0 0 64 459 706 cm /Logo Do Q {text}".encode())
+    page[NameObject("/Contents")] = writer._add_object(content)
+
+    with open(path, "wb") as fp:
+        writer.write(fp)
+
+def make_inputs(folder, count):
+    pixels = bytearray()
+    for y in range(64):
+        for x in range(64):
+            pixels += bytes((x * 4 % 256, y * 4 % 256, (x + y) * 2 % 256))
+    logo_data = zlib.compress(bytes(pixels))
+    for n in range(count):
+        make_statement(os.path.join(folder, f"statement_{n}.pdf"), n, logo_data)
+
+def run_child(folder, out_path, mode):
+    """Runs inside the measured process."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from pdfmerger import merge_pdfs
+
+    t0 = time.perf_counter()
+    merge_pdfs([folder], out_path, streaming=mode == "streaming", dedup=mode == "dedup")
+    seconds = time.perf_counter() - t0
+    print(json.dumps({
+        "seconds": seconds,
+        "max_rss_mb": peak_rss_mb(),
+        "out_bytes": os.path.getsize(out_path),
+    }))
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark classic vs streaming vs deduplicating PDF merges.")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Input counts to test")
+    p.add_argument("--child", nargs=3, metavar=("FOLDER", "OUT", "MODE"), help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        folder, out_path, mode = args.child
+        run_child(folder, out_path, mode)
+        return
+
+    print(f"{'inputs':>8}{'mode':>11}{'seconds':>10}{'peak RSS':>12}{'output':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sizes:
+            folder = os.path.join(tmp, f"in_{count}")
+            os.makedirs(folder)
+            make_inputs(folder, count)
+            for mode in ("classic", "streaming", "dedup"):
+                out_path = os.path.join(tmp, f"merged_{count}_{mode}.pdf")
+                res = subprocess.run([sys.executable, __file__, "--child", folder, out_path, mode],
+                                     capture_output=True, text=True, check=True)
+                r = json.loads(res.stdout.strip().splitlines()[-1])
+                print(f"{count:>8}{mode:>11}{r['seconds']:>10.2f}{format_mb(r['max_rss_mb'], 9)}"
+                      f"{r['out_bytes'] / 1024 / 1024:>9.1f} MB")
+                os.remove(out_path)
+
+if __name__ == "__main__":
+    main()
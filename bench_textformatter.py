@@ -0,0 +1,130 @@
+# Throughput benchmark for TextFormatter's two engines: "lines" (decode, str lines) vs "bytes"
+# (raw UTF-8). Generates synthetic transcripts of the given sizes and runs each engine over them
+# piece by piece, exactly like one batch worker would, each run in a fresh process so peak RSS
+# is per run. The outputs of both engines are hashed and must match.
+#
+#   python bench_textformatter.py --sizes 10 100 1000 --unicode
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None when the platform gives no way to read it."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1048576 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB elsewhere
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss) / 1048576  # peak working set on Windows
+
+def format_mb(mb, width):
+    return f"{'n/a':>{width + 3}}" if mb is None else f"{mb:>{width}.0f} MB"
+
+WORDS = ["so", "yeah", "the", "and", "we", "think", "basically", "quarterly", "numbers", "okay",
+         "right", "customer", "pipeline", "meeting", "follow-up", "actually", "question", "next"]
+UNICODE_WORDS = ["café", "naïve", "Zürich", "日本語", "—", "“quoted”", "São", "Ελλάδα"]
+
+def make_block(rng, words, crlf):
+    """About 1 MB of transcript-like lines: 3-14 words, a blank line every ~6 lines, some trailing spaces."""
+    newline = "\r\n" if crlf else "\n"
+    lines = []
+    size = 0
+    while size < 1 << 20:
+        line = " ".join(rng.choices(words, k=rng.randint(3, 14)))
+        if rng.random() < 0.2:
+            line += " "
+        line += newline
+        if rng.random() < 0.17:
+            line += newline
+        lines.append(line)
+        size += len(line)
+    return "".join(lines).encode("utf-8")
+
+def make_input(path, size_mb, unicode, crlf, seed=0):
+    rng = random.Random(seed)
+    words = WORDS + UNICODE_WORDS if unicode else WORDS
+    blocks = [make_block(rng, words, crlf) for _ in range(16)]
+    written = 0
+    with open(path, "wb") as f:
+        while written < size_mb << 20:
+            block = blocks[rng.randrange(len(blocks))]
+            f.write(block)
+            written += len(block)
+
+def run_child(path, engine, split_size):
+    """Runs inside the measured process."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from TextFormatter import reformat_bytes_to_paragraphs, reformat_to_paragraphs, split_points
+
+    digest = hashlib.blake2b()
+    size = os.path.getsize(path)
+    t0 = time.perf_counter()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        wrote_any = False
+        for start, end in split_points(mm, size, split_size):
+            data = mm[start:end]
+            if engine == "bytes":
+                out = reformat_bytes_to_paragraphs(data)
+            else:
+                out = reformat_to_paragraphs(data.decode("utf-8")).encode("utf-8")
+            if out:
+                if wrote_any:
+                    digest.update(b"\n\n")
+                digest.update(out)
+                wrote_any = True
+    seconds = time.perf_counter() - t0
+    print(json.dumps({
+        "seconds": seconds,
+        "max_rss_mb": peak_rss_mb(),
+        "digest": digest.hexdigest(),
+    }))
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the lines vs bytes reformatting engines.")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Input sizes in MB")
+    p.add_argument("--unicode", action="store_true", help="Mix non-ASCII words into the transcript")
+    p.add_argument("--crlf", action="store_true", help="Use Windows line endings")
+    p.add_argument("--split-size", type=int, default=64, metavar="MB", help="Piece size, as in batch mode")
+    p.add_argument("--child", nargs=3, metavar=("INPUT", "ENGINE", "SPLIT"), help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        path, engine, split_size = args.child
+        run_child(path, engine, int(split_size))
+        return
+
+    print(f"{'size':>8}{'engine':>8}{'seconds':>10}{'MB/s':>9}{'peak RSS':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes:
+            path = os.path.join(tmp, f"transcript_{size_mb}.txt")
+            make_input(path, size_mb, args.unicode, args.crlf)
+            mb = os.path.getsize(path) / 1024 / 1024
+            digests = set()
+            for engine in ("lines", "bytes"):
+                res = subprocess.run([sys.executable, __file__, "--child", path, engine, str(args.split_size << 20)],
+                                     capture_output=True, text=True, check=True)
+                r = json.loads(res.stdout.strip().splitlines()[-1])
+                digests.add(r["digest"])
+                print(f"{size_mb:>5} MB{engine:>8}{r['seconds']:>10.2f}{mb / r['seconds']:>9.1f}"
+                      f"{format_mb(r['max_rss_mb'], 9)}")
+            if len(digests) != 1:
+                sys.exit(f"engines disagree on the {size_mb} MB input")
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# Shared skip-if-up-to-date cache for the conversion scripts (mp3extractor, docxtopdfconvert).
+# Works like make: a job is skipped when its input, its settings and its outputs are all unchanged
+# since the last successful run. The index is a JSON-lines file, one record per finished job;
+# the last record for a job wins, and superseded lines are compacted away when the index is loaded.
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_INDEX = os.path.join(os.path.expanduser("~"), ".buildcache.jsonl")
+HASH_CHUNK = 1 << 20
+RECORD_KEYS = ("size", "mtime", "params", "outputs")
+OUTPUT_KEYS = ("path", "size", "mtime", "hash")
+
+def file_hash(path):
+    """blake2b of a file's content, read in 1 MB chunks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def file_signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def params_hash(params):
+    return hashlib.blake2b(json.dumps(params, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+def job_key(tool, in_path, out_path):
+    return json.dumps([tool, os.path.abspath(in_path), os.path.abspath(out_path)])
+
+class BuildCache:
+    """
+    Skip/record decisions for one tool.
+
+    Inputs are compared by size+mtime; with hash_inputs=True a changed size/mtime is checked
+    against the recorded content hash, so a touched-but-identical file is still a hit (content
+    hashes are only computed in that mode, they cost a full read). Outputs must still exist with
+    the recorded size+mtime, or failing that the recorded content hash. force=True makes every
+    lookup a miss (results are still recorded).
+    """
+
+    def __init__(self, tool, index_path=DEFAULT_INDEX, hash_inputs=False, force=False):
+        self.tool = tool
+        self.index_path = index_path
+        self.hash_inputs = hash_inputs
+        self.force = force
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = {}  # reason -> count
+        self.records = self._load()
+
+    def _load(self):
+        """Read the index; when it holds superseded or unusable lines, rewrite it with one line per job."""
+        records = {}
+        if not os.path.exists(self.index_path):
+            return records
+        lines = 0
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    rec = json.loads(line)
+                    key = job_key(rec["tool"], rec["input"], rec["key_output"])
+                    if not (all(k in rec for k in RECORD_KEYS)
+                            and all(k in out for out in rec["outputs"] for k in OUTPUT_KEYS)):
+                        continue  # valid JSON but not a complete record; dropped by compaction
+                except (ValueError, KeyError, TypeError):
+                    continue  # half-written line from an interrupted run, or not a record of ours
+                records[key] = rec
+        if lines > len(records):
+            self._compact(records.values())
+        return records
+
+    def _compact(self, records):
+        """Rewrite the index atomically; a failure just leaves the old file in place."""
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as out:
+                for rec in records:
+                    out.write(json.dumps(rec) + "\n")
+            os.replace(tmp, self.index_path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def check(self, in_path, out_path, params):
+        """
+        (fresh, reason): fresh means the job for in_path -> out_path with these params can be
+        skipped. out_path is the output the caller asked for; the record lists what was written.
+        Counts the hit/miss.
+        """
+        reason = self._stale_reason(in_path, out_path, params)
+        with self.lock:
+            if reason is None:
+                self.hits += 1
+            else:
+                self.misses[reason] = self.misses.get(reason, 0) + 1
+        return reason is None, reason or "up to date"
+
+    def _stale_reason(self, in_path, out_path, params):
+        if self.force:
+            return "forced"
+        rec = self.records.get(job_key(self.tool, in_path, out_path))
+        if rec is None:
+            return "new"
+        if rec["params"] != params_hash(params):
+            return "settings changed"
+        size, mtime = file_signature(in_path)
+        if (size, mtime) != (rec["size"], rec["mtime"]):
+            if not (self.hash_inputs and rec.get("hash") and size == rec["size"] and file_hash(in_path) == rec["hash"]):
+                return "input changed"
+        for out in rec["outputs"]:
+            if not os.path.exists(out["path"]):
+                return "output missing"
+            if file_signature(out["path"]) != (out["size"], out["mtime"]) and file_hash(out["path"]) != out["hash"]:
+                return "output changed"
+        return None
+
+    def recorded_outputs(self, in_path, out_path):
+        """Files the last successful job for in_path -> out_path wrote ([] if none)."""
+        rec = self.records.get(job_key(self.tool, in_path, out_path))
+        return [out["path"] for out in rec["outputs"]] if rec else []
+
+    def record(self, in_path, out_path, params, outputs=None):
+        """Remember a successful job. outputs: files actually written (default [out_path])."""
+        size, mtime = file_signature(in_path)
+        rec = {
+            "tool": self.tool,
+            "input": os.path.abspath(in_path),
+            "key_output": os.path.abspath(out_path),
+            "size": size,
+            "mtime": mtime,
+            "hash": file_hash(in_path) if self.hash_inputs else None,
+            "params": params_hash(params),
+            "outputs": [],
+        }
+        for path in outputs or [out_path]:
+            out_size, out_mtime = file_signature(path)
+            rec["outputs"].append({"path": os.path.abspath(path), "size": out_size, "mtime": out_mtime,
+                                   "hash": file_hash(path)})
+        with self.lock:
+            self.records[job_key(self.tool, in_path, out_path)] = rec
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+
+    def stats(self):
+        misses = sum(self.misses.values())
+        detail = ", ".join(f"{n} {reason}" for reason, n in sorted(self.misses.items()))
+        return f"Cache: {self.hits} up to date (skipped), {misses} rebuilt" + (f" ({detail})" if detail else "")
@@ -1,4 +1,302 @@
-#Do pip install docx2pdf
+#Do pip install docx2pdf   (Windows/macOS with Word; on Linux install LibreOffice instead)
+# Converts every .docx in a folder to PDF, several documents at a time. Reruns skip documents whose
+# .docx and PDF are unchanged since the last conversion (index in ~/.buildcache.jsonl); --force
+# converts everything again.
+#
+# Backends:
+#   docx2pdf     drives Word; Word converts one document at a time, so this backend has one instance
+#   libreoffice  headless `soffice --convert-to pdf`; each instance has its own user profile so
+#                -j of them can run side by side (profiles are kept between runs, warm starts)
+#   fake         writes a one-page placeholder PDF, for testing the batch plumbing without an office suite
+#
+#python docxtopdfconvert.py
+#python docxtopdfconvert.py "D:\Docs\ToConvert" "D:\Docs\PDFs" --force
+#python docxtopdfconvert.py ~/docs/in ~/docs/pdf --backend libreoffice -j 4 --timeout 120
+import argparse
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from docx2pdf import convert
-convert(r"D:\Docs\ToConvert", r"D:\Docs\PDFs")
+from buildcache import DEFAULT_INDEX, BuildCache
+
+BACKENDS = ("auto", "docx2pdf", "libreoffice", "fake")
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".docxtopdf_profiles")
+SOFFICE_NAMES = ("soffice", "libreoffice")
+
+# -------- Helpers --------
+def find_docx(folder):
+    """.docx files in folder, skipping Word's ~$ lock files."""
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(".docx") and not name.startswith("~$"))
+
+def pdf_path_for(in_path, output_dir):
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(in_path))[0] + ".pdf")
+
+def run_killable(cmd, timeout):
+    """
+    Run cmd in its own process group and wait up to timeout seconds. On timeout the whole group is
+    killed (soffice is a wrapper script around soffice.bin) and RuntimeError is raised.
+    Returns the CompletedProcess; a non-zero exit raises RuntimeError with the tail of its output.
+    """
+    popen_kw = {"start_new_session": True} if os.name == "posix" else {}
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, errors="replace", **popen_kw)
+    try:
+        out, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        if os.name == "posix":
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        else:
+            proc.kill()
+        proc.communicate()
+        raise RuntimeError(f"timed out after {timeout:g}s")
+    if proc.returncode != 0:
+        tail = " | ".join(out.strip().splitlines()[-3:])
+        raise RuntimeError(f"exit code {proc.returncode}" + (f": {tail}" if tail else ""))
+    return subprocess.CompletedProcess(cmd, proc.returncode, out)
+
+# -------- Backends --------
+# A backend instance converts one document at a time: convert(in_path, out_path, timeout) writes
+# out_path or raises RuntimeError. make_backends() returns the pool the scheduler hands documents to.
+class Docx2PdfBackend:
+    """Word via docx2pdf, run in a child process so a stuck Word conversion can be timed out."""
+    name = "docx2pdf"
+    _SCRIPT = "import sys; from docx2pdf import convert; convert(sys.argv[1], sys.argv[2])"
+
+    def __init__(self, index=0):
+        self.index = index
+
+    def convert(self, in_path, out_path, timeout=None):
+        run_killable([sys.executable, "-c", self._SCRIPT, in_path, out_path], timeout)
+
+    def close(self):
+        pass
+
+class LibreOfficeBackend:
+    """One headless soffice per conversion, each instance with its own persistent user profile."""
+    name = "libreoffice"
+
+    def __init__(self, index=0, soffice="soffice", profile_root=DEFAULT_PROFILE_DIR):
+        self.index = index
+        self.soffice = soffice
+        self.profile = os.path.abspath(os.path.join(profile_root, f"instance{index}"))
+        os.makedirs(self.profile, exist_ok=True)
+        self.outdir = tempfile.mkdtemp(prefix=f"docxtopdf{index}_")
+
+    def profile_url(self):
+        path = self.profile.replace("\\", "/")
+        return "file://" + ("" if path.startswith("/") else "/") + path
+
+    def convert(self, in_path, out_path, timeout=None):
+        # soffice names the PDF after the input, so convert into a private folder and move it into place
+        cmd = [self.soffice, f"-env:UserInstallation={self.profile_url()}", "--headless", "--norestore",
+               "--nolockcheck", "--convert-to", "pdf", "--outdir", self.outdir, in_path]
+        result = run_killable(cmd, timeout)
+        produced = pdf_path_for(in_path, self.outdir)
+        if not os.path.exists(produced):
+            tail = " | ".join(result.stdout.strip().splitlines()[-3:])
+            raise RuntimeError("soffice wrote no PDF" + (f": {tail}" if tail else ""))
+        shutil.move(produced, out_path)
+
+    def close(self):
+        shutil.rmtree(self.outdir, ignore_errors=True)
+
+class FakeBackend:
+    """Placeholder PDFs after an optional delay; rejects inputs that are not zip containers like real .docx."""
+    name = "fake"
+
+    def __init__(self, index=0, delay=0.0):
+        self.index = index
+        self.delay = delay
+
+    def convert(self, in_path, out_path, timeout=None):
+        if not zipfile.is_zipfile(in_path):
+            raise RuntimeError("not a .docx (zip) file")
+        if timeout is not None and self.delay > timeout:
+            time.sleep(timeout)
+            raise RuntimeError(f"timed out after {timeout:g}s")
+        time.sleep(self.delay)
+        title = os.path.basename(in_path).encode("latin-1", "replace").replace(b"(", b"[").replace(b")", b"]")
+        content = b"BT /F1 12 Tf 72 720 Td (" + title + b") Tj ET"
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+            b" /Resources << /Font << /F1 5 0 R >> >> >>",
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        ]
+        pdf = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for n, obj in enumerate(objects, 1):
+            offsets.append(len(pdf))
+            pdf += b"%d 0 obj\n%s\nendobj\n" % (n, obj)
+        xref = len(pdf)
+        pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        pdf += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+        pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+        with open(out_path, "wb") as f:
+            f.write(pdf)
+
+    def close(self):
+        pass
+
+def find_soffice(soffice=None):
+    if soffice:
+        return soffice
+    for name in SOFFICE_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+def resolve_backend(name, soffice=None):
+    """auto: docx2pdf where Word can be driven (Windows/macOS with docx2pdf installed), else LibreOffice."""
+    if name != "auto":
+        return name
+    if sys.platform in ("win32", "darwin"):
+        try:
+            import docx2pdf  # noqa: F401
+            return "docx2pdf"
+        except ImportError:
+            pass
+    if find_soffice(soffice):
+        return "libreoffice"
+    raise RuntimeError("no converter found: install LibreOffice (soffice on PATH) or docx2pdf with Word")
+
+def make_backends(name, instances=1, soffice=None, profile_root=DEFAULT_PROFILE_DIR, fake_delay=0.0):
+    if name == "docx2pdf":
+        return [Docx2PdfBackend(0)]  # Word serialises conversions anyway
+    if name == "libreoffice":
+        soffice = find_soffice(soffice)
+        if soffice is None:
+            raise RuntimeError("LibreOffice not found (looked for soffice/libreoffice on PATH; use --soffice)")
+        return [LibreOfficeBackend(i, soffice, profile_root) for i in range(max(1, instances))]
+    if name == "fake":
+        return [FakeBackend(i, fake_delay) for i in range(max(1, instances))]
+    raise ValueError(f"unknown backend {name!r}")
+
+# -------- Batch conversion --------
+def convert_batch(jobs, backends, timeout=DEFAULT_TIMEOUT, cache=None, params=None, log=print):
+    """
+    Convert (docx, pdf) pairs, each document going to whichever backend instance is free next.
+    Largest documents are started first so one big file does not end up last on a single instance.
+    Up-to-date pairs (per cache) are skipped. Returns a summary dict.
+    """
+    params = params or {}
+    todo = []
+    skipped = 0
+    for in_path, out_path in jobs:
+        fresh, reason = cache.check(in_path, out_path, params) if cache else (False, "new")
+        if fresh:
+            skipped += 1
+        else:
+            todo.append((in_path, out_path, reason))
+    todo.sort(key=lambda job: os.path.getsize(job[0]), reverse=True)
+
+    free = queue.Queue()
+    for backend in backends:
+        free.put(backend)
+    per_instance = [0] * len(backends)
+    lock = threading.Lock()
+
+    def run(in_path, out_path):
+        backend = free.get()
+        t0 = time.monotonic()
+        try:
+            backend.convert(in_path, out_path, timeout)
+            with lock:
+                per_instance[backend.index] += 1
+            return backend.index, time.monotonic() - t0
+        finally:
+            free.put(backend)
+
+    converted = 0
+    failed = []
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(backends)) as pool:
+        futures = {pool.submit(run, in_path, out_path): (in_path, out_path, reason)
+                   for in_path, out_path, reason in todo}
+        for fut in as_completed(futures):
+            in_path, out_path, reason = futures[fut]
+            try:
+                index, seconds = fut.result()
+            except Exception as e:
+                failed.append((in_path, str(e)))
+                log(f"FAILED {in_path}: {e}")
+                continue
+            converted += 1
+            if cache:
+                cache.record(in_path, out_path, params)
+            log(f"OK {in_path} -> {out_path} [{reason}, instance {index}, {seconds:.1f}s]")
+    return {
+        "converted": converted,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": time.monotonic() - t0,
+        "per_instance": per_instance,
+    }
+
+def format_batch_summary(summary):
+    seconds = summary["seconds"]
+    rate = summary["converted"] / seconds * 60 if seconds > 0 else 0.0
+    spread = "/".join(str(n) for n in summary["per_instance"])
+    return (f"Converted {summary['converted']} document(s), {summary['skipped']} up to date, "
+            f"{len(summary['failed'])} failed in {seconds:.1f}s ({rate:.1f} documents/min; per instance {spread})")
+
+# -------- Command line --------
+def main():
+    p = argparse.ArgumentParser(description="Convert a folder of .docx files to PDF, skipping up-to-date ones.")
+    p.add_argument("input_dir", nargs="?", default=r"D:\Docs\ToConvert")
+    p.add_argument("output_dir", nargs="?", default=r"D:\Docs\PDFs")
+    p.add_argument("--backend", choices=BACKENDS, default="auto",
+                   help="Converter (default: docx2pdf on Windows/macOS if installed, else LibreOffice)")
+    p.add_argument("-j", "--jobs", type=int, default=min(4, os.cpu_count() or 1),
+                   help="Converter instances running at once (LibreOffice/fake; docx2pdf always uses 1)")
+    p.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                   help="Seconds per document before the conversion is killed (default %(default)g)")
+    p.add_argument("--soffice", help="Path to the soffice executable")
+    p.add_argument("--profile-dir", default=DEFAULT_PROFILE_DIR,
+                   help="Where the LibreOffice instances keep their user profiles (default: %(default)s)")
+    p.add_argument("--fake-delay", type=float, default=0.0, help=argparse.SUPPRESS)
+    p.add_argument("--force", action="store_true", help="Convert every file even if its PDF is up to date")
+    p.add_argument("--cache", default=DEFAULT_INDEX, help="Build cache index (default: %(default)s)")
+    p.add_argument("--hash", action="store_true",
+                   help="Compare .docx content hashes, not just size+mtime (survives touch/copy, costs a full read)")
+    args = p.parse_args()
+
+    try:
+        backend = resolve_backend(args.backend, args.soffice)
+        backends = make_backends(backend, args.jobs, args.soffice, args.profile_dir, args.fake_delay)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = [(path, pdf_path_for(path, args.output_dir)) for path in find_docx(args.input_dir)]
+    cache = BuildCache("docxtopdfconvert", args.cache, args.hash, args.force)
+    print(f"Converting {len(jobs)} document(s) with {len(backends)} {backend} instance(s)...")
+    try:
+        # the converter is deliberately not part of the cache params: a PDF is a PDF whichever produced it
+        summary = convert_batch(jobs, backends, args.timeout, cache)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    finally:
+        for b in backends:
+            b.close()
+    print(format_batch_summary(summary))
+    print(cache.stats())
+    sys.exit(1 if summary["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,843 @@
 import argparse
+import json
 import os
+import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from buildcache import DEFAULT_INDEX, BuildCache
 #Usage examples
 #Default 192 kbps:
 #python extract_mp3_ffmpeg.py "C:\Videos\my clip.mp4"
 #Specify output + bitrate:
 #python extract_mp3_ffmpeg.py "input.mp4" -o "audio.mp3" -b 256k
+#Batch (folders and/or many files, 8 ffmpeg processes, give up on a clip after 10 min, 2 retries):
+#python extract_mp3_ffmpeg.py D:\ingest\clips extra.mp4 -o D:\ingest\mp3 -j 8 --timeout 600 --retries 2
+#Keep AAC audio as .m4a instead of re-encoding (MP3 sources are always copied unless --copy never):
+#python extract_mp3_ffmpeg.py "input.mp4" --allow-m4a
+#Log per-job progress/throughput as JSON lines for monitoring:
+#python extract_mp3_ffmpeg.py D:\ingest\clips --metrics D:\ingest\metrics.jsonl
+#Full MP3 + 128k preview of the first 30 s + a clip, all from one decode:
+#python extract_mp3_ffmpeg.py "talk.mp4" --out path=talk.mp3 --out path=preview.mp3,bitrate=128k,end=30 --out path=qa.m4a,start=52:10,end=1:04:00
+#Encode a 3-hour recording as 8 chunks in parallel, then join them:
+#python extract_mp3_ffmpeg.py "conference.mp4" --chunks 8
+#Reruns skip files whose input and settings are unchanged (index in ~/.buildcache.jsonl); redo everything:
+#python extract_mp3_ffmpeg.py D:\ingest\clips --force
+
+MEDIA_EXTS = (".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi")
+DEFAULT_BITRATE = "192k"
+# Rough libmp3lame speed (x realtime, one process) used to estimate what a stream copy saved
+# when there is no transcode in the same run to measure it from
+TRANSCODE_REALTIME_GUESS = 40.0
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_HMS_RE = re.compile(r"(\d+):(\d+):(\d+(?:\.\d+)?)")
+METRICS_INTERVAL = 5.0  # seconds between progress records per job in the metrics file
+
+def parse_seconds(pattern, line):
+    """Seconds from a 'Duration: HH:MM:SS.ss' line or 'HH:MM:SS.ss' value, or None."""
+    m = pattern.search(line)
+    if not m:
+        return None
+    h, mnt, s = m.groups()
+    return int(h) * 3600 + int(mnt) * 60 + float(s)
+
+def format_hms(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def parse_bitrate(value):
+    """'192k' / '1.5M' / '128000' -> bits per second."""
+    value = value.strip().lower()
+    scale = {"k": 1000, "m": 1000 * 1000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+def probe_audio(in_path):
+    """
+    First audio stream of in_path via ffprobe: {"codec", "bit_rate", "duration"}
+    (bit_rate/duration may be None). None if there is no audio stream or ffprobe is unusable.
+    """
+    if shutil.which("ffprobe") is None:
+        return None
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "a:0",
+           "-show_entries", "stream=codec_name,bit_rate:format=duration", "-of", "json", in_path]
+    try:
+        res = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        info = json.loads(res.stdout or "{}")
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        return None
+    streams = info.get("streams") or []
+    if res.returncode != 0 or not streams:
+        return None
+
+    def number(value, kind):
+        try:
+            return kind(value)
+        except (TypeError, ValueError):  # "N/A" or missing
+            return None
+
+    return {
+        "codec": streams[0].get("codec_name"),
+        "bit_rate": number(streams[0].get("bit_rate"), int),
+        "duration": number((info.get("format") or {}).get("duration"), float),
+    }
+
+def plan_extraction(in_path, out_path, bitrate=None, copy="auto", allow_m4a=False):
+    """
+    Decide between remuxing the audio as-is and transcoding it to MP3. Returns a dict with
+    "copy" (bool), "out_path" (.m4a when AAC is kept), "reason", "bitrate" and the probe's "duration".
+
+    copy="auto" remuxes MP3 audio (and AAC into .m4a if allow_m4a) unless an explicit bitrate
+    asks for something smaller than the source; copy="never" always transcodes.
+    """
+    plan = {"copy": False, "out_path": out_path, "bitrate": bitrate or DEFAULT_BITRATE, "duration": None}
+    if copy == "never":
+        plan["reason"] = "stream copy disabled"
+        return plan
+    info = probe_audio(in_path)
+    if info is None:
+        plan["reason"] = "could not probe the audio stream (ffprobe missing or no audio)"
+        return plan
+    plan["duration"] = info["duration"]
+    codec = info["codec"]
+    src_kbps = f"{info['bit_rate'] // 1000} kb/s" if info["bit_rate"] else "unknown bitrate"
+
+    if codec == "mp3":
+        target = out_path
+    elif codec == "aac" and allow_m4a:
+        target = os.path.splitext(out_path)[0] + ".m4a"
+    else:
+        plan["reason"] = f"source audio is {codec} ({src_kbps})" + (", pass --allow-m4a to keep it" if codec == "aac" else "")
+        return plan
+    # An explicit bitrate below the source's means the caller wants a smaller file
+    if bitrate and (info["bit_rate"] is None or info["bit_rate"] > parse_bitrate(bitrate) * 1.05):
+        plan["reason"] = f"source {codec} is {src_kbps}, -b {bitrate} requested"
+        return plan
+    plan.update(copy=True, out_path=target, reason=f"source audio is already {codec} ({src_kbps})")
+    return plan
+
+def build_ffmpeg_cmd(in_path, out_path, bitrate, copy=False):
+    # -vn = no video, -acodec libmp3lame = encode as MP3, -b:a = bitrate
+    # (copy=True: -c:a copy = remux the existing audio stream, no decode/encode)
+    audio = ["-c:a", "copy"] if copy else ["-acodec", "libmp3lame", "-b:a", bitrate]
+    return [
+        "ffmpeg",
+        "-nostdin",          # never read the terminal (matters with several ffmpeg processes)
+        "-progress", "pipe:1",  # machine-readable key=value progress on stdout...
+        "-nostats",          # ...instead of the human "size= time= speed=" status line
+        "-y",                # overwrite output if exists
+        "-i", in_path,       # input
+        "-vn",               # drop video
+        *audio,
+        out_path
+    ]
+
+def estimated_transcode_seconds(duration, realtime=TRANSCODE_REALTIME_GUESS):
+    return (duration or 0.0) / realtime
+
+# -------- ffmpeg progress --------
+def _progress_number(value, suffix=""):
+    """float from an ffmpeg progress value such as ' 41.3x' or '128.0kbits/s'; None for N/A."""
+    try:
+        return float(value.strip().removesuffix(suffix))
+    except (AttributeError, ValueError):
+        return None
+
+def parse_progress_block(block, duration=None, elapsed=None):
+    """
+    One -progress block (key -> value strings) as a dict:
+      out_time (s of output written), speed (x realtime), bitrate (kbit/s), total_size (bytes),
+      duration (s), percent, eta (s of wall time left), elapsed (s), done (last block)
+    Anything ffmpeg reports as N/A, or that needs an unknown duration, is None.
+    """
+    # out_time_ms is microseconds too (long-standing ffmpeg misnomer); out_time is HH:MM:SS.ffffff
+    us = block.get("out_time_us") or block.get("out_time_ms")
+    out_time = _progress_number(us)
+    if out_time is not None:
+        out_time /= 1e6
+    else:
+        out_time = parse_seconds(_HMS_RE, block.get("out_time", ""))
+    out_time = max(0.0, out_time or 0.0)
+    speed = _progress_number(block.get("speed"), "x")
+    size = _progress_number(block.get("total_size"))
+    done = block.get("progress") == "end"
+
+    percent = eta = None
+    if duration:
+        percent = 100.0 if done else min(100.0, 100.0 * out_time / duration)
+        if done:
+            eta = 0.0
+        elif speed:
+            eta = max(0.0, duration - out_time) / speed
+    return {
+        "out_time": out_time,
+        "speed": speed,
+        "bitrate": _progress_number(block.get("bitrate"), "kbits/s"),
+        "total_size": int(size) if size is not None else None,
+        "duration": duration,
+        "percent": percent,
+        "eta": eta,
+        "elapsed": elapsed,
+        "done": done,
+    }
+
+def iter_ffmpeg_progress(cmd, duration=None, timeout=None):
+    """
+    Run ffmpeg (a build_ffmpeg_cmd command, which asks for -progress pipe:1) and yield a
+    parse_progress_block dict every time ffmpeg finishes a progress block (~twice a second).
+    duration (e.g. from probe_audio) enables percent/ETA; otherwise it is read from the log.
+    Raises subprocess.CalledProcessError with the log tail as .stderr if ffmpeg fails, and
+    subprocess.TimeoutExpired after killing it if it runs past timeout seconds.
+    Stopping the iteration early kills ffmpeg.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+    tail = deque(maxlen=20)
+    found = {"duration": duration}
+
+    def drain_log():
+        # stderr now only carries the log (banner, Duration:, warnings, errors); it must be
+        # read concurrently or ffmpeg blocks once the pipe buffer fills
+        for line in proc.stderr:
+            line = line.rstrip()
+            if found["duration"] is None:
+                found["duration"] = parse_seconds(_DURATION_RE, line)
+            if line:
+                tail.append(line)
+
+    reader = threading.Thread(target=drain_log, daemon=True)
+    reader.start()
+    timed_out = threading.Event()
+    timer = None
+    if timeout:
+        def kill():
+            timed_out.set()
+            proc.kill()
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
+
+    t0 = time.monotonic()
+    block = {}
+    try:
+        for line in proc.stdout:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            block[key] = value
+            if key == "progress":
+                yield parse_progress_block(block, found["duration"], time.monotonic() - t0)
+                block = {}
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        if timer:
+            timer.cancel()
+    rc = proc.wait()
+    reader.join()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    if rc != 0:
+        raise subprocess.CalledProcessError(rc, cmd, stderr="\n".join(tail))
+
+def run_ffmpeg(cmd, on_progress=None, timeout=None, duration=None):
+    """
+    Callback form of iter_ffmpeg_progress: on_progress(update) for every progress block.
+    Returns the last update; raises like iter_ffmpeg_progress.
+    """
+    last = None
+    for last in iter_ffmpeg_progress(cmd, duration, timeout):
+        if on_progress:
+            on_progress(last)
+    return last
+
+def ffmpeg_error(e):
+    """Short message for a failed run: exit code plus ffmpeg's last log line."""
+    last_line = (e.stderr or "").strip().splitlines()[-1:]
+    return f"ffmpeg exit code {e.returncode}" + (f": {last_line[0]}" if last_line else "")
+
+def format_progress(update):
+    """'  42.0%  0:01:24 / 0:03:20  speed 35.1x  128.0 kbit/s  ETA 0:00:03' (unknowns left out)."""
+    parts = []
+    if update["percent"] is not None:
+        parts.append(f"{update['percent']:6.1f}%")
+    total = f" / {format_hms(update['duration'])}" if update["duration"] else ""
+    parts.append(f"{format_hms(update['out_time'])}{total}")
+    if update["speed"] is not None:
+        parts.append(f"speed {update['speed']:.1f}x")
+    if update["bitrate"] is not None:
+        parts.append(f"{update['bitrate']:.1f} kbit/s")
+    if update["eta"] is not None:
+        parts.append(f"ETA {format_hms(update['eta'])}")
+    return "  ".join(parts)
+
+class MetricsLog:
+    """
+    Append-only JSON-lines metrics file shared by all jobs: throttled "progress" records while a
+    job runs and one "done"/"failed" record per job, each with a unix timestamp.
+    """
+
+    def __init__(self, path, interval=METRICS_INTERVAL):
+        self.fp = open(path, "a", encoding="utf-8")
+        self.interval = interval
+        self.lock = threading.Lock()
+        self._last = {}
+
+    def write(self, record):
+        line = json.dumps({"ts": round(time.time(), 3), **record})
+        with self.lock:
+            self.fp.write(line + "\n")
+            self.fp.flush()
+
+    def progress(self, in_path, update):
+        now = time.monotonic()
+        if not update["done"] and now - self._last.get(in_path, 0.0) < self.interval:
+            return
+        self._last[in_path] = now
+        self.write({"event": "progress", "input": in_path, **update})
+
+    def close(self):
+        with self.lock:
+            self.fp.close()
+
+# -------- Multi-output and chunked extraction --------
+# Encoder per output extension; bitrate is ignored for the lossless ones
+CODECS_BY_EXT = {
+    ".mp3": "libmp3lame",
+    ".m4a": "aac",
+    ".aac": "aac",
+    ".opus": "libopus",
+    ".ogg": "libvorbis",
+    ".flac": "flac",
+    ".wav": "pcm_s16le",
+}
+LOSSLESS_CODECS = ("flac", "pcm_s16le", "copy")
+MIN_CHUNK_SECONDS = 60.0
+
+def parse_timestamp(value):
+    """'90', '1:30', '01:02:03.5' -> seconds."""
+    seconds = 0.0
+    for part in value.strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def parse_output_spec(spec):
+    """
+    --out value 'path=clip.mp3,bitrate=128k,start=1:00,end=1:30' -> dict with path, codec, bitrate,
+    start, end (seconds or None). codec defaults from the extension ('copy' remuxes);
+    duration=SECONDS may be given instead of end.
+    """
+    opts = {}
+    for item in spec.split(","):
+        key, sep, value = item.partition("=")
+        if not sep or not value.strip():
+            raise ValueError(f"bad --out item {item!r} (expected key=value)")
+        opts[key.strip()] = value.strip()
+    unknown = set(opts) - {"path", "codec", "bitrate", "start", "end", "duration"}
+    if unknown:
+        raise ValueError(f"unknown --out key(s): {', '.join(sorted(unknown))}")
+    if "path" not in opts:
+        raise ValueError(f"--out {spec!r} needs path=")
+    path = os.path.abspath(opts["path"])
+    codec = opts.get("codec") or CODECS_BY_EXT.get(os.path.splitext(path)[1].lower())
+    if codec is None:
+        raise ValueError(f"can't tell the codec for {path}; add codec=")
+    start = parse_timestamp(opts["start"]) if "start" in opts else None
+    end = parse_timestamp(opts["end"]) if "end" in opts else None
+    if "duration" in opts:
+        end = (start or 0.0) + parse_timestamp(opts["duration"])
+    if end is not None and end <= (start or 0.0):
+        raise ValueError(f"--out {spec!r}: end must be after start")
+    return {"path": path, "codec": codec, "bitrate": opts.get("bitrate", DEFAULT_BITRATE), "start": start, "end": end}
+
+def build_multi_output_cmd(in_path, outputs):
+    """
+    One ffmpeg command writing every output. The input's audio is demuxed and decoded once and
+    the frames are fed to each output's encoder; output-side -ss/-to trim without seeking.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-progress", "pipe:1", "-nostats", "-y", "-i", in_path]
+    for out in outputs:
+        cmd += ["-map", "0:a:0"]
+        if out["start"] is not None:
+            cmd += ["-ss", f"{out['start']:.3f}"]
+        if out["end"] is not None:
+            cmd += ["-to", f"{out['end']:.3f}"]
+        cmd += ["-c:a", out["codec"]]
+        if out["codec"] not in LOSSLESS_CODECS:
+            cmd += ["-b:a", out["bitrate"]]
+        cmd.append(out["path"])
+    return cmd
+
+def extract_multi(in_path, outputs, on_progress=None, timeout=None, duration=None):
+    """Write all parse_output_spec outputs in a single ffmpeg pass. Returns the last progress update."""
+    for out in outputs:
+        os.makedirs(os.path.dirname(out["path"]), exist_ok=True)
+    # ffmpeg's progress follows the longest output, so that is what percent/ETA should use
+    ends = [out["end"] for out in outputs]
+    if duration and all(end is not None for end in ends):
+        duration = min(duration, max(ends))
+    return run_ffmpeg(build_multi_output_cmd(in_path, outputs), on_progress, timeout, duration)
+
+def chunk_ranges(duration, chunks):
+    """(start, length) per chunk; the last length is None = to the end, so nothing is lost to rounding."""
+    chunks = max(1, min(chunks, int(duration // MIN_CHUNK_SECONDS) or 1))
+    step = duration / chunks
+    return [(i * step, step if i < chunks - 1 else None) for i in range(chunks)]
+
+def build_chunk_cmd(in_path, out_path, bitrate, start, length):
+    # Input-side -ss seeks straight to the chunk (accurate: decodes from the previous keyframe)
+    cmd = ["ffmpeg", "-nostdin", "-progress", "pipe:1", "-nostats", "-y", "-ss", f"{start:.3f}"]
+    if length is not None:
+        cmd += ["-t", f"{length:.3f}"]
+    return cmd + ["-i", in_path, "-vn", "-acodec", "libmp3lame", "-b:a", bitrate, out_path]
+
+def extract_chunked(in_path, out_path, bitrate=None, chunks=None, workers=None, duration=None,
+                    timeout=None, on_progress=None):
+    """
+    Transcode a long input as `chunks` time ranges encoded concurrently, then join them with the
+    concat demuxer (-c copy, no second encode). Each MP3 chunk carries its own encoder delay, so
+    seams can have a few ms of silence; use a single pass where that matters.
+    duration comes from probe_audio when not given. Returns the number of chunks used.
+    """
+    bitrate = bitrate or DEFAULT_BITRATE
+    if duration is None:
+        info = probe_audio(in_path)
+        duration = info and info["duration"]
+        if not duration:
+            raise ValueError("chunked extraction needs the input duration (ffprobe)")
+    ranges = chunk_ranges(duration, chunks or os.cpu_count() or 1)
+    workers = workers or len(ranges)
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".chunks_", dir=out_dir)
+    lock = threading.Lock()
+    done = [0.0] * len(ranges)
+
+    def encode(i, start, length):
+        chunk = os.path.join(tmp, f"chunk_{i:04d}.mp3")
+
+        def progress(update):
+            if not on_progress:
+                return
+            with lock:
+                done[i] = update["out_time"]
+                pos = sum(done)
+                on_progress({**update, "out_time": pos, "duration": duration,
+                             "percent": min(100.0, 100.0 * pos / duration), "eta": None, "done": False})
+
+        run_ffmpeg(build_chunk_cmd(in_path, chunk, bitrate, start, length), progress, timeout)
+        return chunk
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(lambda r: encode(*r), [(i, s, n) for i, (s, n) in enumerate(ranges)]))
+        list_path = os.path.join(tmp, "concat.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for part in parts:
+                f.write("file '" + part.replace("'", "'\\''") + "'\n")
+        cmd = ["ffmpeg", "-nostdin", "-progress", "pipe:1", "-nostats", "-y",
+               "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", out_path]
+        run_ffmpeg(cmd, timeout=timeout)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return len(ranges)
+
+# -------- Batch mode --------
+def find_media(inputs, out_dir=None):
+    """
+    (input, output) pairs for files and folders (walked for MEDIA_EXTS). Outputs go next to the
+    input, or under out_dir keeping each folder's relative layout; see unique_outputs for clashes.
+    """
+    jobs = []
+    seen = set()
+
+    def add(path, rel):
+        path = os.path.abspath(path)
+        if path in seen:
+            return
+        seen.add(path)
+        if out_dir:
+            out_path = os.path.join(os.path.abspath(out_dir), os.path.splitext(rel)[0] + ".mp3")
+        else:
+            out_path = os.path.splitext(path)[0] + ".mp3"
+        jobs.append((path, out_path))
+
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, dirnames, filenames in os.walk(item):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith(MEDIA_EXTS):
+                        full = os.path.join(dirpath, name)
+                        add(full, os.path.relpath(full, item))
+        else:
+            add(item, os.path.basename(item))
+    return unique_outputs(jobs)
+
+def unique_outputs(jobs):
+    """
+    Rename outputs that more than one input maps to: clip.mp4 and clip.mov in one folder, or
+    same-named files from different folders under one out_dir, would otherwise be written by
+    concurrent ffmpeg runs to the same .mp3. Colliding outputs keep the input's extension
+    (clip.mov.mp3), plus a counter (clip.mov-2.mp3) if that is taken as well.
+    """
+    counts = {}
+    for _, out_path in jobs:
+        key = os.path.normcase(out_path)
+        counts[key] = counts.get(key, 0) + 1
+    taken = set(counts)
+    renamed = []
+    for in_path, out_path in jobs:
+        if counts[os.path.normcase(out_path)] > 1:
+            base = os.path.splitext(out_path)[0] + os.path.splitext(in_path)[1].lower()
+            out_path = base + ".mp3"
+            n = 2
+            while os.path.normcase(out_path) in taken:
+                out_path = f"{base}-{n}.mp3"
+                n += 1
+            taken.add(os.path.normcase(out_path))
+        renamed.append((in_path, out_path))
+    return renamed
+
+class BatchProgress:
+    """One combined status line for all running ffmpeg jobs, built from their progress updates."""
+
+    def __init__(self, total, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.interval = 0.5 if self.tty else 10.0
+        self.lock = threading.Lock()
+        self.running = {}  # input path -> [seconds encoded, duration or None, speed or None]
+        self.done = 0
+        self.failed = 0
+        self.audio_done = 0.0
+        self._last = 0.0
+        self._width = 0
+
+    def start(self, path):
+        with self.lock:
+            self.running[path] = [0.0, None, None]
+
+    def update(self, path, update):
+        with self.lock:
+            job = self.running.get(path)
+            if job is None:
+                return
+            job[:] = [update["out_time"], update["duration"], update["speed"]]
+            self._render()
+
+    def finish(self, path, ok, message):
+        with self.lock:
+            job = self.running.pop(path, None)
+            if ok:
+                self.done += 1
+                if job:
+                    self.audio_done += job[1] or job[0]
+            else:
+                self.failed += 1
+            self._print(message)
+            self._render(force=True)
+
+    def log(self, message):
+        with self.lock:
+            self._print(message)
+            self._render(force=True)
+
+    def close(self):
+        with self.lock:
+            if self.tty and self._width:
+                self.stream.write("\n")
+                self.stream.flush()
+
+    def status(self):
+        pos = sum(job[0] for job in self.running.values())
+        known = [job for job in self.running.values() if job[1]]
+        pct = ""
+        if known:
+            pct = f", running jobs {100.0 * sum(j[0] for j in known) / sum(j[1] for j in known):.0f}%"
+        speed = sum(job[2] or 0.0 for job in self.running.values())
+        return (f"[{self.done + self.failed}/{self.total} finished, {self.failed} failed, "
+                f"{len(self.running)} running{pct}] audio {format_hms(self.audio_done + pos)}, "
+                f"{speed:.1f}x realtime")
+
+    def _render(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        line = self.status()
+        if self.tty:
+            self.stream.write("\r" + line.ljust(self._width))
+            self._width = len(line)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def _print(self, message):
+        if self.tty and self._width:
+            self.stream.write("\r" + " " * self._width + "\r")
+            self._width = 0
+        self.stream.write(message + "\n")
+
+def extract_one(in_path, out_path, bitrate=None, timeout=None, retries=1, progress=None, copy="auto",
+                allow_m4a=False, metrics=None, cache=None):
+    """
+    Extract one file, retrying failed or timed-out attempts.
+    Returns (ok, attempts, error, plan) with plan["seconds"] set to the successful run's wall time.
+    progress (BatchProgress) and metrics (MetricsLog) receive the ffmpeg progress updates.
+    With a BuildCache, an up-to-date job is not run: attempts is 0 and plan["skipped"] is True.
+    """
+    requested = out_path
+    params = {"bitrate": bitrate or DEFAULT_BITRATE, "explicit_bitrate": bool(bitrate), "copy": copy, "allow_m4a": allow_m4a}
+    if cache:
+        fresh, _ = cache.check(in_path, requested, params)
+        if fresh:
+            outputs = cache.recorded_outputs(in_path, requested)
+            return True, 0, None, {"skipped": True, "out_path": outputs[0] if outputs else requested}
+    try:
+        plan = plan_extraction(in_path, out_path, bitrate, copy, allow_m4a)
+        os.makedirs(os.path.dirname(plan["out_path"]), exist_ok=True)
+    except (OSError, ValueError) as e:
+        # A bad bitrate or an unwritable output folder fails this job, not the whole batch
+        plan = {"copy": False, "out_path": out_path, "bitrate": bitrate or DEFAULT_BITRATE, "duration": None,
+                "reason": "not started"}
+        if metrics:
+            metrics.write(job_record("failed", in_path, plan, 0, None, str(e)))
+        return False, 0, str(e), plan
+    out_path = plan["out_path"]
+    cmd = build_ffmpeg_cmd(in_path, out_path, plan["bitrate"], plan["copy"])
+
+    def on_progress(update):
+        if progress:
+            progress.update(in_path, update)
+        if metrics:
+            metrics.progress(in_path, update)
+
+    error = None
+    last = None
+    for attempt in range(1, retries + 2):
+        if progress:
+            progress.start(in_path)
+        t0 = time.monotonic()
+        try:
+            last = run_ffmpeg(cmd, on_progress, timeout, plan["duration"])
+            plan["seconds"] = time.monotonic() - t0
+            if last and last["duration"]:
+                plan["duration"] = last["duration"]
+            if metrics:
+                metrics.write(job_record("done", in_path, plan, attempt, last))
+            if cache:
+                cache.record(in_path, requested, params, [out_path])
+            return True, attempt, None, plan
+        except subprocess.CalledProcessError as e:
+            error = ffmpeg_error(e)
+        except subprocess.TimeoutExpired:
+            error = f"timed out after {timeout:g}s"
+        except OSError as e:
+            error = str(e)
+        # Don't leave a truncated MP3 behind for the next attempt (or for whoever picks it up)
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        if attempt <= retries and progress:
+            progress.log(f"RETRY {in_path} ({error}), attempt {attempt + 1}/{retries + 1}")
+    if metrics:
+        metrics.write(job_record("failed", in_path, plan, retries + 1, None, error))
+    return False, retries + 1, error, plan
+
+def job_record(event, in_path, plan, attempts, last=None, error=None):
+    """Final metrics record for one job."""
+    seconds = plan.get("seconds")
+    audio = plan["duration"] or (last["out_time"] if last else None)
+    return {
+        "event": event,
+        "input": in_path,
+        "output": plan["out_path"],
+        "mode": "copy" if plan["copy"] else "transcode",
+        "attempts": attempts,
+        "seconds": seconds,
+        "audio_seconds": audio,
+        "realtime": audio / seconds if audio and seconds else None,
+        "speed": last["speed"] if last else None,
+        "bitrate": last["bitrate"] if last else None,
+        "size_bytes": last["total_size"] if last else None,
+        "error": error,
+    }
+
+def extract_batch(jobs, bitrate=None, workers=None, timeout=None, retries=1, stream=sys.stderr,
+                  copy="auto", allow_m4a=False, metrics=None, cache=None):
+    """
+    Run up to `workers` ffmpeg processes at once over (input, output) pairs; threads only
+    supervise, the work happens in ffmpeg. metrics is an optional MetricsLog, cache an optional
+    BuildCache (up-to-date files are skipped). Returns a summary dict.
+    """
+    workers = workers or os.cpu_count() or 1
+    progress = BatchProgress(len(jobs), stream)
+    t0 = time.monotonic()
+    failures = []
+    copied = []
+    transcoded = []
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(extract_one, in_path, out_path, bitrate, timeout, retries, progress, copy, allow_m4a,
+                        metrics, cache): in_path
+            for in_path, out_path in jobs
+        }
+        for fut in as_completed(futures):
+            in_path = futures[fut]
+            ok, attempts, error, plan = fut.result()
+            if plan.get("skipped"):
+                skipped += 1
+                progress.finish(in_path, True, f"SKIP {in_path} -> {plan['out_path']} (up to date)")
+            elif ok:
+                (copied if plan["copy"] else transcoded).append(plan)
+                how = "copy" if plan["copy"] else "transcode"
+                progress.finish(in_path, True, f"OK {in_path} -> {plan['out_path']} [{how}: {plan['reason']}]")
+            else:
+                failures.append((in_path, error))
+                progress.finish(in_path, False, f"FAILED {in_path}: {error} (after {attempts} attempt(s))")
+    progress.close()
+
+    # What the copies would have cost as transcodes, at this run's measured transcode speed if any
+    realtime = TRANSCODE_REALTIME_GUESS
+    transcode_secs = sum(p["seconds"] for p in transcoded)
+    transcode_audio = sum(p["duration"] or 0.0 for p in transcoded)
+    if transcode_secs > 0 and transcode_audio > 0:
+        realtime = transcode_audio / transcode_secs
+    saved = sum(max(0.0, estimated_transcode_seconds(p["duration"], realtime) - p["seconds"]) for p in copied)
+    return {
+        "files": progress.done - skipped,
+        "skipped": skipped,
+        "failed": failures,
+        "copied": len(copied),
+        "transcoded": len(transcoded),
+        "saved_seconds": saved,
+        "transcode_realtime": realtime,
+        "seconds": time.monotonic() - t0,
+        "audio_seconds": progress.audio_done,
+    }
+
+def format_batch_summary(summary):
+    secs = summary["seconds"] or 1e-9
+    return (f"Extracted {summary['files']} file(s) ({summary['copied']} stream-copied, "
+            f"{summary['transcoded']} transcoded), {summary['skipped']} up to date, {len(summary['failed'])} failed, "
+            f"{format_hms(summary['audio_seconds'])} of audio in {format_hms(secs)} "
+            f"({summary['audio_seconds'] / secs:.1f}x realtime); stream copies saved "
+            f"~{format_hms(summary['saved_seconds'])} of encoder time "
+            f"(at {summary['transcode_realtime']:.0f}x realtime)")
 
 def main():
-    p = argparse.ArgumentParser(description="Extract MP3 audio from an MP4 file.")
-    p.add_argument("input", help="Path to input .mp4 file")
-    p.add_argument("-o", "--output", help="Path to output .mp3 (optional)")
-    p.add_argument("-b", "--bitrate", default="192k", help="Audio bitrate (e.g., 128k, 192k, 256k)")
+    p = argparse.ArgumentParser(description="Extract MP3 audio from MP4 files.")
+    p.add_argument("inputs", nargs="+", help="Input .mp4 file; several files or folders run as a batch")
+    p.add_argument("-o", "--output", help="Path to output .mp3 (optional); in batch mode, an output folder")
+    p.add_argument("-b", "--bitrate", help=f"Audio bitrate (e.g., 128k, 192k, 256k); default {DEFAULT_BITRATE}. "
+                                           "Given explicitly, sources above it are re-encoded instead of copied")
+    p.add_argument("--copy", choices=("auto", "never"), default="auto",
+                   help="auto: remux audio that is already MP3 (or AAC with --allow-m4a) instead of re-encoding")
+    p.add_argument("--allow-m4a", action="store_true", help="Keep AAC audio as .m4a rather than transcoding to MP3")
+    p.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                   help="Batch mode: concurrent ffmpeg processes (default: CPU count)")
+    p.add_argument("--timeout", type=float, help="Batch mode: seconds before an ffmpeg run is killed")
+    p.add_argument("--retries", type=int, default=1, help="Batch mode: retries per failed file (default: 1)")
+    p.add_argument("--metrics", help="Append JSON-lines progress/throughput records per job to this file")
+    p.add_argument("--out", action="append", metavar="SPEC",
+                   help="Single file: extra output 'path=X[,bitrate=128k][,start=T][,end=T|duration=T][,codec=C]'; "
+                        "repeat for several outputs, all written from one decode")
+    p.add_argument("--chunks", type=int,
+                   help="Single file: transcode N time ranges concurrently and join them (long inputs)")
+    p.add_argument("--force", action="store_true", help="Redo every file even if its output is up to date")
+    p.add_argument("--cache", default=DEFAULT_INDEX, help="Build cache index (default: %(default)s)")
+    p.add_argument("--no-cache", action="store_true", help="Neither skip nor record finished files")
+    p.add_argument("--hash", action="store_true",
+                   help="Compare input content hashes, not just size+mtime (survives touch/copy, costs a full read)")
     args = p.parse_args()
 
+    if args.bitrate:
+        try:
+            parse_bitrate(args.bitrate)
+        except ValueError:
+            p.error(f"invalid bitrate '{args.bitrate}' (use e.g. 128k, 192k or 256000)")
+
     # 1) Check ffmpeg availability
     if shutil.which("ffmpeg") is None:
         print("Error: ffmpeg not found. Install ffmpeg and ensure it's in your PATH.", file=sys.stderr)
         sys.exit(1)
 
+    if len(args.inputs) > 1 or os.path.isdir(args.inputs[0]):
+        jobs = find_media(args.inputs, args.output)
+        if not jobs:
+            print("Error: no media files found.", file=sys.stderr)
+            sys.exit(1)
+        missing = [in_path for in_path, _ in jobs if not os.path.isfile(in_path)]
+        if missing:
+            print(f"Error: input file not found: {missing[0]}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Extracting {len(jobs)} file(s) with {args.jobs} ffmpeg process(es)...")
+        metrics = MetricsLog(args.metrics) if args.metrics else None
+        cache = None if args.no_cache else BuildCache("mp3extractor", args.cache, args.hash, args.force)
+        try:
+            summary = extract_batch(jobs, args.bitrate, args.jobs, args.timeout, args.retries,
+                                    copy=args.copy, allow_m4a=args.allow_m4a, metrics=metrics, cache=cache)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        finally:
+            if metrics:
+                metrics.close()
+        print(format_batch_summary(summary))
+        if cache:
+            print(cache.stats())
+        sys.exit(1 if summary["failed"] else 0)
+
     # 2) Validate input
-    in_path = os.path.abspath(args.input)
+    in_path = os.path.abspath(args.inputs[0])
     if not os.path.isfile(in_path):
         print(f"Error: input file not found: {in_path}", file=sys.stderr)
         sys.exit(1)
+    cache = None if args.no_cache else BuildCache("mp3extractor", args.cache, args.hash, args.force)
+
+    def up_to_date(key_output, params):
+        if cache is None:
+            return False
+        fresh, _ = cache.check(in_path, key_output, params)
+        if fresh:
+            print(f"Up to date, skipping: {key_output} (use --force to redo)")
+            print(cache.stats())
+        return fresh
+
+    if args.out:
+        try:
+            outputs = [parse_output_spec(spec) for spec in args.out]
+        except ValueError as e:
+            p.error(str(e))
+        if args.output:
+            outputs.insert(0, parse_output_spec(f"path={args.output},bitrate={args.bitrate or DEFAULT_BITRATE}"))
+        params = {"outputs": outputs}
+        if up_to_date(outputs[0]["path"], params):
+            return
+        info = probe_audio(in_path)
+        print(f"Writing {len(outputs)} output(s) from one decode of {in_path}")
+        t0 = time.monotonic()
+        try:
+            extract_multi(in_path, outputs, lambda u: print(format_progress(u)), duration=info and info["duration"])
+        except KeyboardInterrupt:
+            sys.exit(130)
+        except subprocess.CalledProcessError as e:
+            print(e.stderr, file=sys.stderr)
+            print(f"ffmpeg failed with exit code {e.returncode}", file=sys.stderr)
+            sys.exit(e.returncode)
+        for out in outputs:
+            print(f"  {out['path']}")
+        print(f"Done! {len(outputs)} output(s) in {time.monotonic() - t0:.1f}s")
+        if cache:
+            cache.record(in_path, outputs[0]["path"], params, [out["path"] for out in outputs])
+        return
 
     # 3) Derive output name if not provided
     if args.output:
@@ -34,36 +846,83 @@ def main():
         base, _ = os.path.splitext(in_path)
         out_path = base + ".mp3"
 
-    # 4) Build ffmpeg command
-    # -vn = no video, -acodec libmp3lame = encode as MP3, -b:a = bitrate
-    cmd = [
-        "ffmpeg",
-        "-y",                # overwrite output if exists
-        "-i", in_path,       # input
-        "-vn",               # drop video
-        "-acodec", "libmp3lame",
-        "-b:a", args.bitrate,
-        out_path
-    ]
+    requested = out_path
+    params = {"bitrate": args.bitrate or DEFAULT_BITRATE, "explicit_bitrate": bool(args.bitrate), "copy": args.copy,
+              "allow_m4a": args.allow_m4a, "chunks": args.chunks if args.chunks and args.chunks > 1 else None}
+    if up_to_date(requested, params):
+        return
+
+    # 4) Probe the audio stream: remux it if it is already what we want, else transcode
+    plan = plan_extraction(in_path, out_path, args.bitrate, args.copy, args.allow_m4a)
+    out_path = plan["out_path"]
+    print(("Stream copy (no re-encode): " if plan["copy"] else "Transcoding to MP3: ") + plan["reason"])
 
-    # 5) Run and stream progress
+    if args.chunks and args.chunks > 1 and not plan["copy"]:
+        if not plan["duration"]:
+            print("Error: --chunks needs ffprobe to know the input duration.", file=sys.stderr)
+            sys.exit(1)
+        t0 = time.monotonic()
+        last_print = [0.0]
+
+        def show_chunks(update):
+            if time.monotonic() - last_print[0] >= 0.5:
+                last_print[0] = time.monotonic()
+                print(format_progress(update))
+
+        try:
+            used = extract_chunked(in_path, out_path, plan["bitrate"], args.chunks, duration=plan["duration"],
+                                   on_progress=show_chunks)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        except subprocess.CalledProcessError as e:
+            print(e.stderr, file=sys.stderr)
+            print(f"ffmpeg failed with exit code {e.returncode}", file=sys.stderr)
+            sys.exit(e.returncode)
+        print(f"Done! MP3 saved to: {out_path} ({used} chunks) in {time.monotonic() - t0:.1f}s")
+        if cache:
+            cache.record(in_path, requested, params, [out_path])
+        return
+
+    # 5) Build ffmpeg command
+    cmd = build_ffmpeg_cmd(in_path, out_path, plan["bitrate"], plan["copy"])
+
+    # 6) Run and stream progress
     print("Running:", " ".join(cmd))
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+    metrics = MetricsLog(args.metrics) if args.metrics else None
+
+    def show_progress(update):
+        print(format_progress(update))
+        if metrics:
+            metrics.progress(in_path, update)
+
+    t0 = time.monotonic()
     try:
-        for line in proc.stdout:
-            # ffmpeg prints progress to stderr (merged into stdout here)
-            if "time=" in line or "Duration:" in line:
-                print(line.strip())
+        last = run_ffmpeg(cmd, show_progress, duration=plan["duration"])
     except KeyboardInterrupt:
-        proc.kill()
         sys.exit(130)
+    except subprocess.CalledProcessError as e:
+        print(e.stderr, file=sys.stderr)
+        print(f"ffmpeg failed with exit code {e.returncode}", file=sys.stderr)
+        if metrics:
+            metrics.write(job_record("failed", in_path, plan, 1, None, ffmpeg_error(e)))
+            metrics.close()
+        sys.exit(e.returncode)
+    seconds = time.monotonic() - t0
+    plan["seconds"] = seconds
+    if metrics:
+        metrics.write(job_record("done", in_path, plan, 1, last))
+        metrics.close()
+    if cache:
+        cache.record(in_path, requested, params, [out_path])
 
-    rc = proc.wait()
-    if rc != 0:
-        print(f"ffmpeg failed with exit code {rc}", file=sys.stderr)
-        sys.exit(rc)
-
-    print(f"Done! MP3 saved to: {out_path}")
+    if plan["copy"]:
+        estimate = estimated_transcode_seconds(plan["duration"])
+        print(f"Done! Audio saved to: {out_path} in {seconds:.1f}s "
+              f"(re-encoding would take ~{estimate:.0f}s at {TRANSCODE_REALTIME_GUESS:.0f}x realtime, "
+              f"saved ~{max(0.0, estimate - seconds):.0f}s)")
+    else:
+        print(f"Done! MP3 saved to: {out_path} in {seconds:.1f}s")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
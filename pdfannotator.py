@@ -3,8 +3,771 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 import fitz  # PyMuPDF
 from PIL import Image, ImageTk
+import argparse
 import json
 import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from buildcache import file_hash
+
+RENDER_ZOOM = 1.5       # zoom a page opens at
+ZOOM_LEVELS = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0)  # fixed steps so cached tiles get reused
+TILE_SIZE = 512         # tiles are TILE_SIZE x TILE_SIZE display pixels
+PREVIEW_PX = 1024       # long side of the low-res whole-page placeholder
+RENDER_CACHE_MB = 256   # rendered tiles/previews kept in memory (raw RGB)
+RENDER_WORKERS = 2
+PREFETCH_RADIUS = 2     # pages on each side whose previews are rendered ahead of time
+POLL_MS = 15
+MAX_RENDER_CRASHES = 3  # a render in flight during this many worker crashes is reported as failed
+GRID_CELL = 128         # spatial index cell size, in PDF points
+LINE_HEIGHT = 1.2       # annotation box height as a multiple of the font size
+JOURNAL_FORMAT = "pdfannotator-journal"
+JOURNAL_EXT = ".pdfann"
+COMPACT_AFTER = 5000    # edit records appended since the last compaction before compacting again
+
+# ---------- PAGE RENDERING ----------
+# PyMuPDF is not thread-safe, so pages are rendered in worker processes that each open
+# their own copy of the document; only the PhotoImage is built on the Tk thread.
+# Render keys: (page, "preview") is the whole page at preview_zoom(), (page, zoom, col, row)
+# is one TILE_SIZE tile of the page at that zoom. Only tiles in view are rendered, so memory
+# and latency follow the window size, not the page size.
+_render_doc = None
+
+def preview_zoom(width, height):
+    return PREVIEW_PX / max(width, height)
+
+def tile_clip(col, row, zoom):
+    """Page-space rectangle covered by a tile."""
+    size = TILE_SIZE / zoom
+    return fitz.Rect(col * size, row * size, (col + 1) * size, (row + 1) * size)
+
+def tile_range(start, length, total):
+    """Indices of the tiles overlapping [start, start + length) on an axis total pixels long."""
+    last = (total - 1) // TILE_SIZE
+    first = max(0, int(start // TILE_SIZE))
+    return range(min(first, last), min(last, int((start + length - 1) // TILE_SIZE)) + 1)
+
+def _init_page_renderer(pdf_path):
+    global _render_doc
+    _render_doc = fitz.open(pdf_path)
+
+def _render(key):
+    t0 = time.perf_counter()
+    page = _render_doc[key[0]]
+    if key[1] == "preview":
+        zoom = preview_zoom(page.rect.width, page.rect.height)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    else:
+        _, zoom, col, row = key
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=tile_clip(col, row, zoom) & page.rect)
+    return pix.width, pix.height, pix.samples, time.perf_counter() - t0
+
+class PageCache:
+    """LRU of rendered images (PIL) keyed by render key, bounded by total pixel bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()
+        self.bytes = 0
+
+    def __contains__(self, key):
+        return key in self.images
+
+    def __len__(self):
+        return len(self.images)
+
+    def get(self, key):
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        old = self.images.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old.mode) * old.width * old.height
+        self.images[key] = image
+        self.bytes += len(image.mode) * image.width * image.height
+        # Evict least recently used, but never the image just added
+        while self.bytes > self.max_bytes and len(self.images) > 1:
+            _, dropped = self.images.popitem(last=False)
+            self.bytes -= len(dropped.mode) * dropped.width * dropped.height
+
+    def clear(self):
+        self.images.clear()
+        self.bytes = 0
+
+class PageRenderer:
+    """
+    Renders tiles and previews in worker processes into a PageCache. want() takes every key the
+    view needs, most urgent first, and drops queued work it no longer needs; poll() (Tk thread)
+    moves finished renders into the cache.
+    """
+
+    def __init__(self, pdf_path, cache_mb=RENDER_CACHE_MB, workers=RENDER_WORKERS):
+        self.pdf_path = pdf_path
+        self.workers = workers
+        self.pool = self._start_pool()
+        self.cache = PageCache(cache_mb * 1024 * 1024)
+        self.pending = {}  # key -> future
+        self.failed = {}   # key -> error message
+        self.restarts = 0  # pools replaced after a worker died
+        self.crashes = {}  # key -> times it was in flight when the pool broke
+        self.hits = 0
+        self.misses = 0
+        self.render_times = []
+        self.last_wait = None
+
+    def _start_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_page_renderer, initargs=(self.pdf_path,))
+
+    def restart(self):
+        """
+        Replace a pool broken by a dead worker (e.g. a MuPDF crash). Everything in flight is lost
+        and earlier failures get another chance, since they may have been caused by the crash.
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = self._start_pool()
+        self.pending.clear()
+        self.failed.clear()
+        self.restarts += 1
+
+    def lookup(self, key):
+        """Cached image for something about to be shown, counted towards the hit rate."""
+        image = self.cache.get(key)
+        if image is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return image
+
+    def want(self, keys):
+        keep = set(keys)
+        for key, fut in list(self.pending.items()):
+            if key not in keep and fut.cancel():
+                del self.pending[key]
+        for key in keys:
+            if key not in self.cache and key not in self.pending and key not in self.failed:
+                try:
+                    self.pending[key] = self.pool.submit(_render, key)
+                except BrokenProcessPool:
+                    self.restart()
+                    self.pending[key] = self.pool.submit(_render, key)
+
+    def poll(self):
+        """Move finished renders into the cache; returns their keys. Restarts the pool if a worker died."""
+        done = []
+        broken = []
+        for key, fut in list(self.pending.items()):
+            if not fut.done():
+                continue
+            del self.pending[key]
+            if fut.cancelled():
+                continue
+            if isinstance(fut.exception(), BrokenProcessPool):
+                broken.append(key)
+                continue
+            if fut.exception() is not None:
+                self.failed[key] = str(fut.exception())
+                continue
+            width, height, samples, seconds = fut.result()
+            self.cache.put(key, Image.frombytes("RGB", (width, height), samples))
+            self.render_times.append(seconds)
+            done.append(key)
+        if broken:
+            self.restart()
+            # Can't tell which render killed the worker; a key caught in repeated crashes is given up on
+            for key in broken:
+                self.crashes[key] = self.crashes.get(key, 0) + 1
+                if self.crashes[key] >= MAX_RENDER_CRASHES:
+                    self.failed[key] = "render worker crashed"
+        return done
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rate = f"{self.hits / lookups:.0%}" if lookups else "-"
+        line = (f"Cache: {len(self.cache)} image(s), {self.cache.bytes / 1048576:.0f}/{self.cache.max_bytes / 1048576:.0f} MB"
+                f" | hit rate {rate} ({self.hits}/{lookups})")
+        if self.render_times:
+            recent = self.render_times[-20:]
+            line += (f" | render {self.render_times[-1] * 1000:.0f} ms"
+                     f" (avg {sum(recent) / len(recent) * 1000:.0f} ms)")
+        if self.last_wait is not None:
+            line += f" | view complete after {self.last_wait * 1000:.0f} ms"
+        return line + f" | rendering {len(self.pending)}"
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.cache.clear()
+
+# ---------- ANNOTATION STORE ----------
+_helv_widths = {}  # char -> advance at font size 1; Helvetica has no kerning, so widths just add up
+
+def text_width(text, font_size):
+    """Width in points of text set in Helvetica, as export's insert_text(fontname="helv") lays it out."""
+    total = 0.0
+    for ch in text:
+        w = _helv_widths.get(ch)
+        if w is None:
+            w = _helv_widths[ch] = fitz.get_text_length(ch, fontname="helv", fontsize=1)
+        total += w
+    return total * font_size
+
+class Annotation:
+    """One text annotation, positioned by its top-left corner in PDF points."""
+    __slots__ = ("page", "x_pdf", "y_pdf", "text", "font_size", "color_name", "color_rgb", "width")
+
+    def __init__(self, page, x_pdf, y_pdf, text, font_size, color_name, color_rgb):
+        self.page = page
+        self.x_pdf = x_pdf
+        self.y_pdf = y_pdf
+        self.text = text
+        self.font_size = font_size
+        self.color_name = color_name
+        self.color_rgb = tuple(color_rgb)  # (r, g, b) in 0–1
+        self.width = text_width(text, font_size)
+
+    def bbox(self):
+        return self.x_pdf, self.y_pdf, self.x_pdf + self.width, self.y_pdf + self.font_size * LINE_HEIGHT
+
+    def to_dict(self):
+        return {
+            "page": self.page,
+            "x_pdf": self.x_pdf,
+            "y_pdf": self.y_pdf,
+            "text": self.text,
+            "font_size": self.font_size,
+            "color_name": self.color_name,
+            "color_rgb": self.color_rgb,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["page"], d["x_pdf"], d["y_pdf"], d["text"], d["font_size"], d["color_name"], d["color_rgb"])
+
+def _grid_cells(bbox):
+    x0, y0, x1, y1 = bbox
+    for cx in range(int(x0 // GRID_CELL), int(x1 // GRID_CELL) + 1):
+        for cy in range(int(y0 // GRID_CELL), int(y1 // GRID_CELL) + 1):
+            yield cx, cy
+
+class AnnotationStore:
+    """
+    Annotations indexed by page, each page with a uniform grid of GRID_CELL cells for hit-testing.
+    Annotations are addressed by an integer id; higher ids were added later and draw on top.
+    """
+
+    def __init__(self, annotations=(), journal=None):
+        self.by_id = {}
+        self.pages = {}  # page -> {id: Annotation}, in drawing order
+        self.grids = {}  # page -> {(cx, cy): set of ids}
+        self.next_id = 0
+        self.journal = None
+        self.unloaded = set()  # pages still only on disk (journal-backed stores load pages on first use)
+        for ann in annotations:
+            self.add(ann)
+        if journal:
+            self.attach(journal)
+
+    def attach(self, journal):
+        """Record every later edit in journal; pages the journal has but this store lacks load lazily."""
+        self.journal = journal
+        self.unloaded = set(journal.page_counts) - set(self.pages)
+        self.next_id = max(self.next_id, journal.next_id)
+
+    def _ensure(self, page):
+        if page in self.unloaded:
+            self.unloaded.discard(page)
+            for ann_id, ann in self.journal.load_page(page):
+                self._insert(ann_id, ann)
+
+    def __len__(self):
+        return len(self.by_id) + sum(self.journal.page_counts[p] for p in self.unloaded)
+
+    def __iter__(self):
+        for page in list(self.unloaded):
+            self._ensure(page)
+        for page in sorted(self.pages):
+            yield from self.pages[page].values()
+
+    def get(self, ann_id):
+        return self.by_id[ann_id]
+
+    def on_page(self, page):
+        """(id, Annotation) pairs for page, in drawing order."""
+        self._ensure(page)
+        return self.pages.get(page, {}).items()
+
+    def _index(self, ann_id, ann):
+        grid = self.grids.setdefault(ann.page, {})
+        for cell in _grid_cells(ann.bbox()):
+            grid.setdefault(cell, set()).add(ann_id)
+
+    def _unindex(self, ann_id, ann):
+        grid = self.grids[ann.page]
+        for cell in _grid_cells(ann.bbox()):
+            ids = grid[cell]
+            ids.discard(ann_id)
+            if not ids:
+                del grid[cell]
+
+    def _insert(self, ann_id, ann):
+        self.by_id[ann_id] = ann
+        self.pages.setdefault(ann.page, {})[ann_id] = ann
+        self._index(ann_id, ann)
+
+    def add(self, ann):
+        self._ensure(ann.page)
+        ann_id = self.next_id
+        self.next_id += 1
+        self._insert(ann_id, ann)
+        if self.journal:
+            self.journal.log_add(ann_id, ann)
+        return ann_id
+
+    def remove(self, ann_id):
+        ann = self.by_id.pop(ann_id)
+        self._unindex(ann_id, ann)
+        del self.pages[ann.page][ann_id]
+        if self.journal:
+            self.journal.log_delete(ann_id, ann)
+        return ann
+
+    def move(self, ann_id, dx, dy):
+        ann = self.by_id[ann_id]
+        self._unindex(ann_id, ann)
+        ann.x_pdf += dx
+        ann.y_pdf += dy
+        self._index(ann_id, ann)
+        if self.journal:
+            self.journal.log_move(ann_id, ann)
+
+    def query(self, page, bbox):
+        """Ids on page whose box intersects bbox (x0, y0, x1, y1), in drawing order."""
+        self._ensure(page)
+        grid = self.grids.get(page)
+        if not grid:
+            return []
+        x0, y0, x1, y1 = bbox
+        found = set()
+        for cell in _grid_cells(bbox):
+            for ann_id in grid.get(cell, ()):
+                if ann_id in found:
+                    continue
+                ax0, ay0, ax1, ay1 = self.by_id[ann_id].bbox()
+                if ax0 <= x1 and x0 <= ax1 and ay0 <= y1 and y0 <= ay1:
+                    found.add(ann_id)
+        return sorted(found)
+
+    def hit(self, page, x, y):
+        """Topmost annotation id under (x, y), or None."""
+        ids = self.query(page, (x, y, x, y))
+        return ids[-1] if ids else None
+
+    def to_dicts(self):
+        return [ann.to_dict() for ann in self]
+
+# ---------- PROJECT JOURNAL ----------
+# A .pdfann project is a JSON-lines file:
+#   line 1    header: format, source PDF path (absolute and relative to the project), size, mtime,
+#             content hash, and index_at, the byte offset of the index line (fixed width, so the
+#             header can be rewritten in place)
+#   ["s", sid, color_name, [r, g, b], font_size]    interned style
+#   ["a", id, page, x, y, sid, text]                annotation (compacted part: sorted by page)
+#   ["i", {"pages": {page: [start, end, count]}, "next_id": n}]   byte range of each page's records
+#   then the journal: one appended line per edit since the last compaction
+#   ["a", ...] add, ["m", id, page, x, y] move, ["d", id, page] delete, ["s", ...] new style
+# Opening reads the header, the index and the journal tail; a page's records are read and parsed
+# the first time the page is used. Compaction rewrites the file with the journal folded in,
+# copying untouched pages' byte ranges as they are.
+def _line(record):
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+def is_journal(path):
+    with open(path, "rb") as f:
+        first = f.readline()
+    try:
+        header = json.loads(first)
+    except ValueError:
+        return False
+    return isinstance(header, dict) and header.get("format") == JOURNAL_FORMAT
+
+def pdf_header(pdf_path, project_path, previous=None):
+    """Source-PDF fields of the header; the content hash is reused while size and mtime are unchanged."""
+    st = os.stat(pdf_path)
+    if (previous and previous.get("pdf_size") == st.st_size and previous.get("pdf_mtime") == st.st_mtime_ns
+            and os.path.abspath(previous.get("pdf_path", "")) == os.path.abspath(pdf_path)):
+        digest = previous["pdf_hash"]
+    else:
+        digest = file_hash(pdf_path)
+    try:
+        relpath = os.path.relpath(os.path.abspath(pdf_path), os.path.dirname(os.path.abspath(project_path)))
+    except ValueError:
+        relpath = None  # Windows: PDF and project on different drives
+    return {
+        "pdf_path": os.path.abspath(pdf_path),
+        "pdf_relpath": relpath,
+        "pdf_size": st.st_size,
+        "pdf_mtime": st.st_mtime_ns,
+        "pdf_hash": digest,
+    }
+
+def locate_source_pdf(header, project_path):
+    """
+    Find the project's source PDF: the recorded path, then the same path relative to the project,
+    then any PDF of the recorded size next to the project or in the recorded folder whose content
+    hash matches (only same-size files are hashed). Returns a path or None.
+    """
+    pdf_path = header.get("pdf_path")
+    if pdf_path and os.path.exists(pdf_path):
+        return pdf_path
+    project_dir = os.path.dirname(os.path.abspath(project_path))
+    relpath = header.get("pdf_relpath")
+    if relpath and os.path.exists(os.path.join(project_dir, relpath)):
+        return os.path.join(project_dir, relpath)
+    size = header.get("pdf_size")
+    digest = header.get("pdf_hash")
+    if size is None or not digest:
+        return None
+    folders = [project_dir]
+    if pdf_path and os.path.isdir(os.path.dirname(pdf_path)):
+        folders.append(os.path.dirname(pdf_path))
+    for folder in folders:
+        for entry in os.scandir(folder):
+            if (entry.name.lower().endswith(".pdf") and entry.is_file()
+                    and entry.stat().st_size == size and file_hash(entry.path) == digest):
+                return entry.path
+    return None
+
+class ProjectJournal:
+    """An open .pdfann project: lazy page loading, O(1) appended edits, compaction."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None  # append handle, opened on the first edit
+        with open(path, "rb") as f:
+            self.header = json.loads(f.readline())
+            if self.header.get("format") != JOURNAL_FORMAT:
+                raise ValueError(f"{path} is not an annotator project journal")
+            index_at = int(self.header["index_at"])
+            self.styles = {}
+            self.style_ids = {}
+            while f.tell() < index_at:
+                record = json.loads(f.readline())
+                if record[0] != "s":
+                    break
+                self._add_style(*record[1:])
+            f.seek(index_at)
+            index = json.loads(f.readline())[1]
+            self.page_ranges = {int(page): tuple(r) for page, r in index["pages"].items()}
+            self.next_id = index["next_id"]
+            self.page_counts = {page: r[2] for page, r in self.page_ranges.items()}
+            self.tail_ops = {}  # page -> journal records, in order
+            self.tail_records = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # half-written line from an interrupted session
+                self._replay(record)
+
+    def _add_style(self, sid, color_name, rgb, font_size):
+        self.styles[sid] = (color_name, tuple(rgb), font_size)
+        self.style_ids[self.styles[sid]] = sid
+
+    def _replay(self, record):
+        kind = record[0]
+        self.tail_records += 1
+        if kind == "s":
+            self._add_style(*record[1:])
+            return
+        page = record[2]
+        self.tail_ops.setdefault(page, []).append(record)
+        if kind == "a":
+            self.page_counts[page] = self.page_counts.get(page, 0) + 1
+            self.next_id = max(self.next_id, record[1] + 1)
+        elif kind == "d":
+            self.page_counts[page] -= 1
+
+    def _annotation(self, record):
+        _, ann_id, page, x, y, sid, text = record
+        color_name, rgb, font_size = self.styles[sid]
+        return ann_id, Annotation(page, x, y, text, font_size, color_name, rgb)
+
+    def load_page(self, page):
+        """(id, Annotation) pairs for page: its compacted records with the journal applied."""
+        anns = {}
+        if page in self.page_ranges:
+            start, end, _ = self.page_ranges[page]
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                chunk = f.read(end - start)
+            for line in chunk.splitlines():
+                ann_id, ann = self._annotation(json.loads(line))
+                anns[ann_id] = ann
+        for record in self.tail_ops.get(page, ()):
+            if record[0] == "a":
+                ann_id, ann = self._annotation(record)
+                anns[ann_id] = ann
+            elif record[0] == "m" and record[1] in anns:
+                anns[record[1]].x_pdf, anns[record[1]].y_pdf = record[3], record[4]
+            elif record[0] == "d":
+                anns.pop(record[1], None)
+        return list(anns.items())
+
+    # -- edits: one appended line each --
+    def _append(self, record):
+        if self.file is None:
+            self.file = open(self.path, "ab+")
+            self.file.seek(-1, os.SEEK_END)
+            if self.file.read(1) != b"\n":
+                self.file.write(b"\n")  # end a line cut short by a crash so it cannot swallow this one
+        self.file.write(_line(record))
+        self.file.flush()
+        self._replay(record)
+
+    def _style_id(self, ann):
+        key = (ann.color_name, tuple(ann.color_rgb), ann.font_size)
+        sid = self.style_ids.get(key)
+        if sid is None:
+            sid = len(self.styles)
+            self._append(["s", sid, ann.color_name, list(ann.color_rgb), ann.font_size])
+        return self.style_ids[key]
+
+    def _add_record(self, ann_id, ann):
+        return ["a", ann_id, ann.page, round(ann.x_pdf, 2), round(ann.y_pdf, 2), self._style_id(ann), ann.text]
+
+    def log_add(self, ann_id, ann):
+        self._append(self._add_record(ann_id, ann))
+
+    def log_move(self, ann_id, ann):
+        self._append(["m", ann_id, ann.page, round(ann.x_pdf, 2), round(ann.y_pdf, 2)])
+
+    def log_delete(self, ann_id, ann):
+        self._append(["d", ann_id, ann.page])
+
+    def needs_compaction(self):
+        return self.tail_records >= COMPACT_AFTER
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    @staticmethod
+    def write(path, header, styles, page_chunks, next_id):
+        """
+        Write a compacted project atomically. styles: {sid: (color_name, rgb, font_size)};
+        page_chunks: (page, encoded "a" lines, count) in page order.
+        """
+        header = dict(header, format=JOURNAL_FORMAT, version=1, index_at="0" * 12)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_line(header))
+                for sid, (color_name, rgb, font_size) in styles.items():
+                    f.write(_line(["s", sid, color_name, list(rgb), font_size]))
+                pages = {}
+                for page, chunk, count in page_chunks:
+                    start = f.tell()
+                    f.write(chunk)
+                    pages[page] = [start, f.tell(), count]
+                index_at = f.tell()
+                f.write(_line(["i", {"pages": pages, "next_id": next_id}]))
+                header["index_at"] = "%012d" % index_at
+                f.seek(0)
+                f.write(_line(header))  # same length as the placeholder version
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def create(cls, path, pdf_path, store):
+        """Save store as a new project at path and return it opened, with store attached to it."""
+        if store.journal:
+            store.journal.compact(store, pdf_path, path)
+            return store.journal
+        journal_styles, style_ids, chunks = {}, {}, []
+        for page in sorted(store.pages):
+            lines = []
+            for ann_id, ann in store.pages[page].items():
+                key = (ann.color_name, tuple(ann.color_rgb), ann.font_size)
+                if key not in style_ids:
+                    style_ids[key] = len(journal_styles)
+                    journal_styles[style_ids[key]] = key
+                lines.append(_line(["a", ann_id, page, round(ann.x_pdf, 2), round(ann.y_pdf, 2),
+                                    style_ids[key], ann.text]))
+            if lines:
+                chunks.append((page, b"".join(lines), len(lines)))
+        cls.write(path, pdf_header(pdf_path, path), journal_styles, chunks, store.next_id)
+        journal = cls(path)
+        store.attach(journal)
+        return journal
+
+    def compact(self, store, pdf_path=None, path=None):
+        """
+        Rewrite the project (optionally to a new path / with a new source PDF) with the journal folded
+        in. Pages without edits are copied byte for byte; edited pages are re-serialised from store.
+        """
+        path = path or self.path
+        pdf_path = pdf_path or self.header["pdf_path"]
+        touched = set(self.tail_ops)
+        # Serialise edited pages first: they may intern styles, which are written before any page
+        edited = {}
+        for page in sorted(touched):
+            store._ensure(page)
+            lines = [self._add_record(ann_id, ann) for ann_id, ann in store.pages.get(page, {}).items()]
+            if lines:
+                edited[page] = (b"".join(_line(r) for r in lines), len(lines))
+
+        def chunks():
+            with open(self.path, "rb") as f:
+                for page in sorted(set(self.page_ranges) | touched):
+                    if page in edited:
+                        yield (page,) + edited[page]
+                    elif page not in touched:
+                        start, end, count = self.page_ranges[page]
+                        f.seek(start)
+                        yield page, f.read(end - start), count
+
+        header = pdf_header(pdf_path, path, self.header)
+        self.close()
+        self.write(path, header, self.styles, chunks(), store.next_id)
+        self.__init__(path)
+        store.unloaded = set(self.page_counts) - set(store.pages)
+
+# ---------- EXPORT ----------
+_helv_font = None
+
+def write_annotations(doc, annotations):
+    """
+    Stamp annotations into doc page by page: one TextWriter per page and colour (a TextWriter
+    has a single colour), so each page gets one new content stream per colour instead of
+    one per annotation. Positions match page.insert_text: (x_pdf, y_pdf) is the baseline start.
+    """
+    global _helv_font
+    if _helv_font is None:
+        _helv_font = fitz.Font("helv")
+    by_page = {}
+    for ann in annotations:
+        by_page.setdefault(ann.page, {}).setdefault(tuple(ann.color_rgb), []).append(ann)
+    for page_no in sorted(by_page):
+        page = doc[page_no]
+        for color, anns in by_page[page_no].items():
+            writer = fitz.TextWriter(page.rect, color=color)
+            for ann in anns:
+                writer.append((ann.x_pdf, ann.y_pdf), ann.text, font=_helv_font, fontsize=ann.font_size)
+            writer.write_text(page)
+
+def export_annotated(src_path, annotations, out_path, incremental=True, src_data=None):
+    """
+    Write src_path plus annotations to out_path. Incremental mode copies the source file as is
+    and appends only the new/changed objects, so the cost follows the annotations, not the
+    source size; it falls back to a full rewrite when the source cannot be saved incrementally
+    (e.g. it needed repair). src_data: the source's bytes, if already read.
+    Returns "incremental" or "full".
+    """
+    if os.path.abspath(out_path) == os.path.abspath(src_path):
+        raise ValueError("export to a different file than the original PDF")
+    # Build the export next to out_path and move it into place only once it is complete,
+    # so a failed export never leaves an unannotated copy that looks finished
+    root, ext = os.path.splitext(out_path)
+    tmp_path = f"{root}.{os.getpid()}.tmp{ext}"
+    try:
+        mode = _export_to(src_path, annotations, tmp_path, incremental, src_data)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return mode
+
+def _export_to(src_path, annotations, out_path, incremental, src_data):
+    if incremental:
+        if src_data is None:
+            shutil.copyfile(src_path, out_path)
+        else:
+            with open(out_path, "wb") as f:
+                f.write(src_data)
+        doc = fitz.open(out_path)
+        try:
+            if doc.can_save_incrementally():
+                write_annotations(doc, annotations)
+                doc.saveIncr()
+                return "incremental"
+        finally:
+            doc.close()
+    doc = fitz.open("pdf", src_data) if src_data is not None else fitz.open(src_path)
+    try:
+        write_annotations(doc, annotations)
+        doc.save(out_path)
+    finally:
+        doc.close()
+    return "full"
+
+def load_project_file(path):
+    """(pdf_path, [Annotation]) from a .pdfann journal or a legacy JSON project."""
+    if is_journal(path):
+        journal = ProjectJournal(path)
+        return locate_source_pdf(journal.header, path), list(AnnotationStore(journal=journal))
+    with open(path, "r", encoding="utf-8") as f:
+        project_data = json.load(f)
+    return project_data.get("pdf_path"), [Annotation.from_dict(d) for d in project_data.get("annotations", [])]
+
+def export_projects(project_paths, out_dir=None, incremental=True, log=print):
+    """
+    Export many projects headlessly. Projects are grouped by source PDF and each source is read
+    once and shared by all of its projects. Output: <out_dir or project folder>/<project>_annotated.pdf;
+    a project whose output would overwrite an earlier project's (same name, different folder) fails.
+    Returns the number of failures.
+    """
+    by_source = {}
+    outputs = {}  # normalised output path -> project writing it
+    failures = 0
+    for path in project_paths:
+        base = os.path.splitext(os.path.basename(path))[0] + "_annotated.pdf"
+        out_path = os.path.join(out_dir or os.path.dirname(os.path.abspath(path)), base)
+        key = os.path.normcase(os.path.abspath(out_path))
+        if key in outputs:
+            log(f"FAILED {path}: output {out_path} collides with {outputs[key]}")
+            failures += 1
+            continue
+        outputs[key] = path
+        try:
+            pdf_path, annotations = load_project_file(path)
+        except (OSError, ValueError, KeyError) as e:
+            log(f"FAILED {path}: {e}")
+            failures += 1
+            continue
+        if not pdf_path or not os.path.exists(pdf_path):
+            log(f"FAILED {path}: source PDF not found: {pdf_path}")
+            failures += 1
+            continue
+        by_source.setdefault(os.path.abspath(pdf_path), []).append((path, annotations, out_path))
+
+    for pdf_path, projects in by_source.items():
+        with open(pdf_path, "rb") as f:
+            src_data = f.read()
+        for path, annotations, out_path in projects:
+            t0 = time.perf_counter()
+            try:
+                mode = export_annotated(pdf_path, annotations, out_path, incremental, src_data)
+            except Exception as e:
+                log(f"FAILED {path}: {e}")
+                failures += 1
+                continue
+            log(f"OK {path} -> {out_path} ({len(annotations)} annotation(s), {mode}, "
+                f"{time.perf_counter() - t0:.2f}s)")
+    return failures
 
 class PDFAnnotator(tk.Tk):
     def __init__(self):
@@ -15,21 +778,31 @@ class PDFAnnotator(tk.Tk):
         self.doc = None
         self.pdf_path = None
         self.page_index = 0
-        self.page_image = None
-        self.page_photo = None
         self.page_width = None
         self.page_height = None
         self.display_width = None
         self.display_height = None
+        self.zoom = RENDER_ZOOM
+        self.renderer = None
+        self.tile_items = {}         # tile key -> (canvas item, PhotoImage), only tiles in view
+        self.placeholder_photo = None
+        self.waiting_since = None    # when the view last had missing tiles
+        self.poll_job = None
+        self.view_job = None
 
-        # List of annotations:
-        # {page, x_pdf, y_pdf, text, font_size, color_name, color_rgb}
-        self.annotations = []
+        # Annotations by page, with a spatial index for hit-testing
+        self.annotations = AnnotationStore()
+        self.ann_items = {}       # annotation id -> canvas item, for the page on screen
+        self.ann_items_key = None  # (page, zoom) the items were drawn for
+        self.selected = None      # selected annotation id
+        self.drag = None          # (annotation id, start x, start y, last x, last y) in canvas pixels
 
         # ---- UI ----
         self.create_menu()
         self.create_toolbar()
+        self.create_statusbar()
         self.create_canvas()
+        self.protocol("WM_DELETE_WINDOW", self.on_quit)
 
     # ---------- UI SETUP ----------
     def create_menu(self):
@@ -41,10 +814,18 @@ class PDFAnnotator(tk.Tk):
         file_menu.add_command(label="Load Project", command=self.load_project)
         file_menu.add_separator()
         file_menu.add_command(label="Export Annotated PDF", command=self.export_pdf)
+        self.incremental_export = tk.BooleanVar(value=True)
+        file_menu.add_checkbutton(label="Fast Export (append to a copy of the original)",
+                                  variable=self.incremental_export)
         file_menu.add_separator()
-        file_menu.add_command(label="Quit", command=self.quit)
+        file_menu.add_command(label="Quit", command=self.on_quit)
 
         menubar.add_cascade(label="File", menu=file_menu)
+
+        view_menu = tk.Menu(menubar, tearoff=0)
+        self.show_stats = tk.BooleanVar(value=False)
+        view_menu.add_checkbutton(label="Render Stats", variable=self.show_stats, command=self.toggle_statusbar)
+        menubar.add_cascade(label="View", menu=view_menu)
         self.config(menu=menubar)
 
     def create_toolbar(self):
@@ -81,10 +862,60 @@ class PDFAnnotator(tk.Tk):
         self.page_label = tk.Label(toolbar, text="Page: - / -")
         self.page_label.pack(side=tk.LEFT, padx=10)
 
+        # Zoom (also Ctrl+wheel, Ctrl+plus/minus, Ctrl+0 to fit)
+        tk.Button(toolbar, text="-", width=2, command=lambda: self.step_zoom(-1)).pack(side=tk.LEFT, padx=2)
+        self.zoom_label = tk.Label(toolbar, text=f"{RENDER_ZOOM:.0%}", width=5)
+        self.zoom_label.pack(side=tk.LEFT)
+        tk.Button(toolbar, text="+", width=2, command=lambda: self.step_zoom(1)).pack(side=tk.LEFT, padx=2)
+        tk.Button(toolbar, text="Fit", command=self.fit_page).pack(side=tk.LEFT, padx=2)
+
+    def create_statusbar(self):
+        # Debug line: render cache size, hit rate and render times (View > Render Stats)
+        self.status_label = tk.Label(self, text="", anchor=tk.W, relief=tk.SUNKEN, font=("Courier", 9))
+
+    def toggle_statusbar(self):
+        if self.show_stats.get():
+            self.status_label.pack(side=tk.BOTTOM, fill=tk.X, before=self.canvas_frame)
+            self.update_statusbar()
+        else:
+            self.status_label.pack_forget()
+
+    def update_statusbar(self):
+        if self.show_stats.get():
+            text = self.renderer.stats() if self.renderer else "No PDF loaded"
+            if self.renderer:
+                text += f" | zoom {self.zoom:.0%}, {len(self.tile_items)} tile(s) on screen"
+            self.status_label.config(text=text)
+
     def create_canvas(self):
-        self.canvas = tk.Canvas(self, bg="gray")
-        self.canvas.pack(fill=tk.BOTH, expand=True)
+        frame = tk.Frame(self)
+        frame.pack(fill=tk.BOTH, expand=True)
+        self.canvas = tk.Canvas(frame, bg="gray", highlightthickness=0)
+        xbar = tk.Scrollbar(frame, orient=tk.HORIZONTAL, command=self.on_xscroll)
+        ybar = tk.Scrollbar(frame, orient=tk.VERTICAL, command=self.on_yscroll)
+        self.canvas.config(xscrollcommand=xbar.set, yscrollcommand=ybar.set)
+        xbar.pack(side=tk.BOTTOM, fill=tk.X)
+        ybar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas_frame = frame
+
         self.canvas.bind("<Button-1>", self.on_canvas_click)
+        self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
+        self.canvas.bind("<Delete>", self.delete_selected)
+        self.canvas.bind("<BackSpace>", self.delete_selected)
+        self.canvas.bind("<Escape>", lambda e: self.select(None))
+        self.canvas.bind("<Configure>", lambda e: self.schedule_view_update())
+        # Pan: wheel, Shift+wheel, middle-button drag; zoom: Ctrl+wheel
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", self.on_wheel)
+        self.canvas.bind("<Button-5>", self.on_wheel)
+        self.canvas.bind("<ButtonPress-2>", lambda e: self.canvas.scan_mark(e.x, e.y))
+        self.canvas.bind("<B2-Motion>", self.on_drag)
+        self.bind("<Control-plus>", lambda e: self.step_zoom(1))
+        self.bind("<Control-equal>", lambda e: self.step_zoom(1))
+        self.bind("<Control-minus>", lambda e: self.step_zoom(-1))
+        self.bind("<Control-0>", lambda e: self.fit_page())
 
     # ---------- PDF HANDLING ----------
     def open_pdf(self):
@@ -100,38 +931,217 @@ class PDFAnnotator(tk.Tk):
             messagebox.showerror("Error", f"Failed to open PDF:\n{e}")
             return
 
+        self.close_project()
         self.pdf_path = path
         self.page_index = 0
-        self.annotations = []
+        self.annotations = AnnotationStore()
+        self.ann_items_key = None
+        self.selected = None
+        self.start_renderer()
         self.render_page()
         self.update_page_label()
 
-    def render_page(self):
+    def start_renderer(self):
+        if self.renderer:
+            self.renderer.close()
+        self.renderer = PageRenderer(self.pdf_path)
+
+    def on_quit(self):
+        if self.renderer:
+            self.renderer.close()
+        self.close_project()
+        self.quit()
+
+    def render_page(self, keep_view=False):
+        """Lay out the current page at self.zoom; tiles are filled in by update_view()."""
         if not self.doc:
             return
 
         page = self.doc[self.page_index]
         self.page_width = page.rect.width
         self.page_height = page.rect.height
+        self.display_width = self.page_width * self.zoom
+        self.display_height = self.page_height * self.zoom
+        self.zoom_label.config(text=f"{self.zoom:.0%}")
 
-        # Zoom factor for better quality
-        zoom = 1.5
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
+        # Tiles belong to one (page, zoom); annotation items are kept and updated in place
+        self.canvas.delete("tile", "placeholder")
+        self.tile_items = {}
+        self.placeholder_photo = None
+        self.canvas.config(scrollregion=(0, 0, self.display_width, self.display_height))
+        if not keep_view:
+            self.canvas.xview_moveto(0)
+            self.canvas.yview_moveto(0)
 
-        self.display_width = pix.width
-        self.display_height = pix.height
+        # Draw annotations for this page
+        self.draw_annotations_for_current_page()
+        self.waiting_since = time.perf_counter()
+        self.schedule_view_update()
 
-        image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        self.page_image = image
-        self.page_photo = ImageTk.PhotoImage(image)
+    def visible_area(self):
+        """(x0, y0, x1, y1) of the page in display pixels that the canvas currently shows."""
+        x0 = max(0.0, self.canvas.canvasx(0))
+        y0 = max(0.0, self.canvas.canvasy(0))
+        x1 = min(self.display_width, self.canvas.canvasx(self.canvas.winfo_width()))
+        y1 = min(self.display_height, self.canvas.canvasy(self.canvas.winfo_height()))
+        return x0, y0, max(x0 + 1, x1), max(y0 + 1, y1)
 
-        self.canvas.delete("all")
-        self.canvas.config(scrollregion=(0, 0, pix.width, pix.height))
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.page_photo, tags="page_img")
+    def schedule_view_update(self):
+        # Scroll/resize events come in bursts; update once they settle
+        if self.view_job is None and self.doc:
+            self.view_job = self.after_idle(self.update_view)
 
-        # Draw annotations for this page
-        self.draw_annotations_for_current_page()
+    def update_view(self):
+        self.view_job = None
+        if not self.doc or not self.renderer:
+            return
+        x0, y0, x1, y1 = self.visible_area()
+        width = int(round(self.display_width))
+        height = int(round(self.display_height))
+        cols = tile_range(x0, x1 - x0, width)
+        rows = tile_range(y0, y1 - y0, height)
+        visible = [(self.page_index, self.zoom, c, r) for r in rows for c in cols]
+
+        # Show the tiles that are ready, forget the ones scrolled out of view
+        for key in list(self.tile_items):
+            if key not in visible:
+                self.canvas.delete(self.tile_items.pop(key)[0])
+        missing = []
+        for key in visible:
+            if key in self.tile_items:
+                continue
+            image = self.renderer.lookup(key)
+            if image is None:
+                missing.append(key)
+                continue
+            photo = ImageTk.PhotoImage(image)
+            item = self.canvas.create_image(key[2] * TILE_SIZE, key[3] * TILE_SIZE, anchor=tk.NW,
+                                            image=photo, tags="tile")
+            self.tile_items[key] = (item, photo)
+
+        preview_key = (self.page_index, "preview")
+        self.draw_placeholder(preview_key if missing else None, x0, y0, x1, y1)
+        self.canvas.tag_raise("tile")
+        self.canvas.tag_raise("annotation")
+        self.canvas.tag_raise("selection")
+
+        if not missing and self.waiting_since is not None:
+            self.renderer.last_wait = time.perf_counter() - self.waiting_since
+            self.waiting_since = None
+        elif missing and self.waiting_since is None:
+            self.waiting_since = time.perf_counter()
+
+        # Most urgent first: preview, visible tiles, a ring of tiles around the view, neighbour previews
+        ring_cols = tile_range(x0 - TILE_SIZE, x1 - x0 + 2 * TILE_SIZE, width)
+        ring_rows = tile_range(y0 - TILE_SIZE, y1 - y0 + 2 * TILE_SIZE, height)
+        ring = [(self.page_index, self.zoom, c, r) for r in ring_rows for c in ring_cols]
+        neighbours = []
+        for step in range(1, PREFETCH_RADIUS + 1):
+            neighbours += [self.page_index + step, self.page_index - step]  # forward first
+        self.renderer.want([preview_key] + missing + [k for k in ring if k not in self.tile_items]
+                           + [(i, "preview") for i in neighbours if 0 <= i < len(self.doc)])
+        self.schedule_poll()
+        self.update_statusbar()
+
+    def draw_placeholder(self, preview_key, x0, y0, x1, y1):
+        """Low-res stand-in under the tiles still rendering, scaled to just the visible area."""
+        self.canvas.delete("placeholder")
+        self.placeholder_photo = None
+        if preview_key is None:
+            return
+        if preview_key in self.renderer.failed:
+            self.canvas.create_text(x0 + 20, y0 + 20, anchor=tk.NW, fill="white", tags="placeholder",
+                                    text=f"Failed to render page {self.page_index + 1}:\n"
+                                         f"{self.renderer.failed[preview_key]}")
+            return
+        preview = self.renderer.cache.get(preview_key)
+        if preview is None:
+            self.canvas.create_text(x0 + 20, y0 + 20, anchor=tk.NW, fill="white", tags="placeholder",
+                                    text=f"Rendering page {self.page_index + 1}...")
+            return
+        scale = preview.width / self.display_width
+        crop = preview.crop((int(x0 * scale), int(y0 * scale),
+                             max(int(x0 * scale) + 1, int(x1 * scale + 1)), max(int(y0 * scale) + 1, int(y1 * scale + 1))))
+        region = crop.resize((max(1, int(x1 - x0)), max(1, int(y1 - y0))), Image.BILINEAR)
+        self.placeholder_photo = ImageTk.PhotoImage(region)
+        self.canvas.create_image(int(x0), int(y0), anchor=tk.NW, image=self.placeholder_photo, tags="placeholder")
+        self.canvas.tag_lower("placeholder")
+
+    def schedule_poll(self):
+        if self.poll_job is None and self.renderer and self.renderer.pending:
+            self.poll_job = self.after(POLL_MS, self.poll_renders)
+
+    def poll_renders(self):
+        self.poll_job = None
+        if not self.renderer:
+            return
+        failures = len(self.renderer.failed)
+        restarts = self.renderer.restarts
+        done = self.renderer.poll()
+        if (any(key[0] == self.page_index for key in done) or len(self.renderer.failed) > failures
+                or self.renderer.restarts > restarts):
+            # A restart dropped the queued renders; update_view asks for them again
+            self.update_view()
+        elif done:
+            self.update_statusbar()
+        self.schedule_poll()
+
+    # ---------- ZOOM / PAN ----------
+    def set_zoom(self, zoom, anchor=None):
+        """Change zoom keeping the page point under anchor (canvas window x, y; default centre) in place."""
+        if not self.doc or zoom == self.zoom:
+            return
+        if anchor is None:
+            anchor = (self.canvas.winfo_width() / 2, self.canvas.winfo_height() / 2)
+        ax, ay = anchor
+        px = self.canvas.canvasx(ax) / self.zoom
+        py = self.canvas.canvasy(ay) / self.zoom
+        self.zoom = zoom
+        self.render_page(keep_view=True)
+        self.canvas.xview_moveto(max(0.0, px * zoom - ax) / self.display_width)
+        self.canvas.yview_moveto(max(0.0, py * zoom - ay) / self.display_height)
+
+    def step_zoom(self, direction, anchor=None):
+        if direction > 0:
+            bigger = [z for z in ZOOM_LEVELS if z > self.zoom + 1e-9]
+            self.set_zoom(bigger[0] if bigger else self.zoom, anchor)
+        else:
+            smaller = [z for z in ZOOM_LEVELS if z < self.zoom - 1e-9]
+            self.set_zoom(smaller[-1] if smaller else self.zoom, anchor)
+
+    def fit_page(self):
+        """Largest zoom step at which the whole page fits the window."""
+        if not self.doc:
+            return
+        fit = min(self.canvas.winfo_width() / self.page_width, self.canvas.winfo_height() / self.page_height)
+        fitting = [z for z in ZOOM_LEVELS if z <= fit]
+        self.set_zoom(fitting[-1] if fitting else ZOOM_LEVELS[0])
+
+    def on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            direction = -1
+        else:
+            direction = 1
+        if event.state & 0x0004:  # Ctrl
+            self.step_zoom(-direction, (event.x, event.y))
+            return
+        if event.state & 0x0001:  # Shift
+            self.canvas.xview_scroll(direction * 3, "units")
+        else:
+            self.canvas.yview_scroll(direction * 3, "units")
+        self.schedule_view_update()
+
+    def on_drag(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.schedule_view_update()
+
+    def on_xscroll(self, *args):
+        self.canvas.xview(*args)
+        self.schedule_view_update()
+
+    def on_yscroll(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_view_update()
 
     def update_page_label(self):
         if not self.doc:
@@ -156,9 +1166,33 @@ class PDFAnnotator(tk.Tk):
             self.update_page_label()
 
     # ---------- ANNOTATIONS ----------
+    # Click on an annotation selects it (drag to move, Delete to remove); click elsewhere places text.
     def on_canvas_click(self, event):
         if not self.doc:
             return
+        self.canvas.focus_set()
+
+        # Convert canvas (display) coordinates to PDF coordinates
+        x_display = self.canvas.canvasx(event.x)
+        y_display = self.canvas.canvasy(event.y)
+
+        # Protection if display sizes are None
+        if not self.display_width or not self.display_height:
+            return
+
+        # Scale factors: PDF coords vs display coords
+        scale_x = self.page_width / self.display_width
+        scale_y = self.page_height / self.display_height
+
+        x_pdf = x_display * scale_x
+        y_pdf = y_display * scale_y
+
+        hit = self.annotations.hit(self.page_index, x_pdf, y_pdf)
+        if hit is not None:
+            self.select(hit)
+            self.drag = (hit, x_display, y_display, x_display, y_display)
+            return
+        self.select(None)
 
         text = self.text_entry.get().strip()
         if not text:
@@ -174,60 +1208,97 @@ class PDFAnnotator(tk.Tk):
         color_name = self.color_var.get()
         color_rgb = self.color_name_to_rgb(color_name)
 
-        # Convert canvas (display) coordinates to PDF coordinates
-        x_display = event.x
-        y_display = event.y
+        ann = Annotation(self.page_index, x_pdf, y_pdf, text, font_size, color_name, color_rgb)
+        ann_id = self.annotations.add(ann)
 
-        # Protection if display sizes are None
-        if not self.display_width or not self.display_height:
-            return
+        # Draw immediately on canvas
+        self.draw_single_annotation(ann_id, ann)
+        self.autosave()
 
-        # Scale factors: PDF coords vs display coords
-        scale_x = self.page_width / self.display_width
-        scale_y = self.page_height / self.display_height
+    def on_canvas_drag(self, event):
+        if self.drag is None:
+            return
+        ann_id, x0, y0, last_x, last_y = self.drag
+        x = self.canvas.canvasx(event.x)
+        y = self.canvas.canvasy(event.y)
+        # Move just this item and its selection box; the index is updated on release
+        self.canvas.move(self.ann_items[ann_id], x - last_x, y - last_y)
+        self.canvas.move("selection", x - last_x, y - last_y)
+        self.drag = (ann_id, x0, y0, x, y)
 
-        x_pdf = x_display * scale_x
-        y_pdf = y_display * scale_y
+    def on_canvas_release(self, event):
+        if self.drag is None:
+            return
+        ann_id, x0, y0, x, y = self.drag
+        self.drag = None
+        if (x, y) != (x0, y0):
+            self.annotations.move(ann_id, (x - x0) / self.zoom, (y - y0) / self.zoom)
+            self.autosave()
 
-        ann = {
-            "page": self.page_index,
-            "x_pdf": x_pdf,
-            "y_pdf": y_pdf,
-            "text": text,
-            "font_size": font_size,
-            "color_name": color_name,
-            "color_rgb": color_rgb,  # (r, g, b) in 0–1
-        }
-        self.annotations.append(ann)
+    def select(self, ann_id):
+        self.selected = ann_id
+        self.canvas.delete("selection")
+        if ann_id is None:
+            return
+        x0, y0, x1, y1 = self.annotations.get(ann_id).bbox()
+        z = self.zoom
+        self.canvas.create_rectangle(x0 * z - 2, y0 * z - 2, x1 * z + 2, y1 * z + 2,
+                                     outline="#1e90ff", dash=(4, 2), tags="selection")
 
-        # Draw immediately on canvas
-        self.draw_single_annotation(ann)
+    def delete_selected(self, event=None):
+        if self.selected is None:
+            return
+        self.annotations.remove(self.selected)
+        self.canvas.delete(self.ann_items.pop(self.selected))
+        self.select(None)
+        self.autosave()
 
     def draw_annotations_for_current_page(self):
-        for ann in self.annotations:
-            if ann["page"] == self.page_index:
-                self.draw_single_annotation(ann)
+        """
+        Bring the annotation items in line with the current page and zoom: a new page replaces
+        them, a new zoom only moves and resizes the existing items.
+        """
+        key = (self.page_index, self.zoom)
+        if self.ann_items_key == key:
+            return
+        if self.ann_items_key is not None and self.ann_items_key[0] == self.page_index:
+            z = self.zoom
+            for ann_id, item in self.ann_items.items():
+                ann = self.annotations.get(ann_id)
+                self.canvas.coords(item, ann.x_pdf * z, ann.y_pdf * z)
+                self.canvas.itemconfig(item, font=self.annotation_font(ann))
+            self.select(self.selected)
+        else:
+            self.canvas.delete("annotation")
+            self.ann_items = {}
+            self.select(None)
+            for ann_id, ann in self.annotations.on_page(self.page_index):
+                self.draw_single_annotation(ann_id, ann)
+        self.ann_items_key = key
 
-    def draw_single_annotation(self, ann):
+    def annotation_font(self, ann):
+        return ("Helvetica", -max(1, round(ann.font_size * self.zoom)))  # pixels, scales with zoom
+
+    def draw_single_annotation(self, ann_id, ann):
         # Convert PDF coords to display coords
         scale_x = self.display_width / self.page_width
         scale_y = self.display_height / self.page_height
 
-        x_display = ann["x_pdf"] * scale_x
-        y_display = ann["y_pdf"] * scale_y
+        x_display = ann.x_pdf * scale_x
+        y_display = ann.y_pdf * scale_y
 
-        r, g, b = ann["color_rgb"]
+        r, g, b = ann.color_rgb
         # Convert 0–1 RGB to hex for Tkinter
         color_hex = "#{:02x}{:02x}{:02x}".format(
             int(r * 255), int(g * 255), int(b * 255)
         )
 
-        self.canvas.create_text(
+        self.ann_items[ann_id] = self.canvas.create_text(
             x_display,
             y_display,
-            text=ann["text"],
+            text=ann.text,
             fill=color_hex,
-            font=("Helvetica", ann["font_size"]),
+            font=self.annotation_font(ann),
             anchor=tk.NW,
             tags="annotation",
         )
@@ -248,45 +1319,77 @@ class PDFAnnotator(tk.Tk):
         return mapping.get(name, (0, 0, 0))
 
     # ---------- SAVE / LOAD PROJECT ----------
+    # .pdfann projects are journals: once saved or loaded, every edit is appended to the file as it
+    # happens (see ProjectJournal). Legacy .json projects can still be loaded and saved.
     def save_project(self):
         if not self.pdf_path:
             messagebox.showerror("Error", "No PDF loaded.")
             return
 
-        project_data = {
-            "pdf_path": self.pdf_path,
-            "annotations": self.annotations,
-        }
-
         path = filedialog.asksaveasfilename(
-            defaultextension=".json",
-            filetypes=[("JSON files", "*.json")]
+            defaultextension=JOURNAL_EXT,
+            filetypes=[("Annotator projects", "*" + JOURNAL_EXT), ("JSON files", "*.json")]
         )
         if not path:
             return
 
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(project_data, f, indent=2)
+            if path.lower().endswith(".json"):
+                project_data = {
+                    "pdf_path": self.pdf_path,
+                    "annotations": self.annotations.to_dicts(),
+                }
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(project_data, f, indent=2)
+            else:
+                ProjectJournal.create(path, self.pdf_path, self.annotations)
             messagebox.showinfo("Saved", "Project saved successfully.")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save project:\n{e}")
 
+    def autosave(self):
+        """Called after each edit; the edit itself is already in the journal, this only compacts it."""
+        journal = self.annotations.journal
+        if journal and journal.needs_compaction():
+            try:
+                journal.compact(self.annotations)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to compact project:\n{e}")
+
+    def close_project(self):
+        if self.annotations.journal:
+            self.annotations.journal.close()
+
     def load_project(self):
         path = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json")]
+            filetypes=[("Annotator projects", "*" + JOURNAL_EXT + " *.json"), ("All files", "*.*")]
         )
         if not path:
             return
 
+        journal = None
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                project_data = json.load(f)
+            if is_journal(path):
+                journal = ProjectJournal(path)
+                pdf_path = locate_source_pdf(journal.header, path)
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    project_data = json.load(f)
+                pdf_path = project_data.get("pdf_path")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load project:\n{e}")
             return
 
-        pdf_path = project_data.get("pdf_path")
+        if journal and not pdf_path:
+            # Moved somewhere we did not look: let the user point at it, and check it is the same file
+            pdf_path = filedialog.askopenfilename(
+                title=f"Locate {os.path.basename(journal.header.get('pdf_path', 'the source PDF'))}",
+                filetypes=[("PDF files", "*.pdf")]
+            )
+            if pdf_path and file_hash(pdf_path) != journal.header.get("pdf_hash"):
+                if not messagebox.askyesno("Different PDF", "This PDF's content differs from the one the "
+                                                           "project was made on. Use it anyway?"):
+                    return
         if not pdf_path or not os.path.exists(pdf_path):
             messagebox.showerror(
                 "Error",
@@ -300,9 +1403,18 @@ class PDFAnnotator(tk.Tk):
             messagebox.showerror("Error", f"Failed to open PDF:\n{e}")
             return
 
+        self.close_project()
         self.pdf_path = pdf_path
-        self.annotations = project_data.get("annotations", [])
+        if journal:
+            self.annotations = AnnotationStore(journal=journal)
+            if os.path.abspath(pdf_path) != os.path.abspath(journal.header["pdf_path"]):
+                journal.compact(self.annotations, pdf_path)  # remember where the PDF is now
+        else:
+            self.annotations = AnnotationStore(Annotation.from_dict(d) for d in project_data.get("annotations", []))
+        self.ann_items_key = None
+        self.selected = None
         self.page_index = 0
+        self.start_renderer()
         self.render_page()
         self.update_page_label()
         messagebox.showinfo("Loaded", "Project loaded successfully.")
@@ -320,32 +1432,37 @@ class PDFAnnotator(tk.Tk):
         if not export_path:
             return
 
-        # Open original PDF again to avoid modifying in-place
+        # Works on a fresh copy of the original; the open document is never modified
         try:
-            doc = fitz.open(self.pdf_path)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to open original PDF:\n{e}")
-            return
-
-        try:
-            for ann in self.annotations:
-                page = doc[ann["page"]]
-                point = fitz.Point(ann["x_pdf"], ann["y_pdf"])
-                r, g, b = ann["color_rgb"]
-                page.insert_text(
-                    point,
-                    ann["text"],
-                    fontsize=ann["font_size"],
-                    fontname="helv",
-                    fill=(r, g, b),
-                )
-
-            doc.save(export_path)
-            doc.close()
-            messagebox.showinfo("Exported", "Annotated PDF exported successfully.")
+            t0 = time.perf_counter()
+            mode = export_annotated(self.pdf_path, self.annotations, export_path, self.incremental_export.get())
+            messagebox.showinfo("Exported", f"Annotated PDF exported successfully "
+                                            f"({mode} save, {time.perf_counter() - t0:.1f}s).")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export PDF:\n{e}")
 
-if __name__ == "__main__":
+def main():
     app = PDFAnnotator()
     app.mainloop()
+
+# -------- Command line --------
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Export annotated PDFs from project files without the GUI.")
+    parser.add_argument("projects", nargs="+", help="Project files (.pdfann or legacy .json) saved from the annotator")
+    parser.add_argument("-o", "--out-dir", help="Output folder (default: next to each project file)")
+    parser.add_argument("--full", action="store_true",
+                        help="Rewrite each PDF completely instead of appending to a copy of the original")
+    args = parser.parse_args(argv)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    failures = export_projects(args.projects, args.out_dir, incremental=not args.full)
+    print(f"Exported {len(args.projects) - failures} of {len(args.projects)} project(s) "
+          f"in {time.perf_counter() - t0:.1f}s")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    # Arguments -> headless export; no arguments -> GUI
+    if len(sys.argv) > 1:
+        sys.exit(cli())
+    main()
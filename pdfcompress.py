@@ -1,10 +1,20 @@
 #Do this first #pip install pymupdf pillow
+import argparse
+import io
+import json
 import os
+import re
+import sys
 import threading
+import time
 import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import fitz  # PyMuPDF
 from PIL import Image
-from tkinter import Tk, Label, Button, Scale, HORIZONTAL, filedialog, StringVar, IntVar, Checkbutton
+from tkinter import Tk, Label, Button, Scale, Entry, HORIZONTAL, filedialog, StringVar, IntVar, Checkbutton
+
+STREAM_BUDGET_MB = 512
 
 # -------- Helpers --------
 def human_size(n):
@@ -14,53 +24,524 @@ def human_size(n):
         n /= 1024
     return f"{n:.2f} PB"
 
+def parse_size(text):
+    """Parse '10MB', '750 KB', '1.5g' or a plain byte count into bytes."""
+    t = text.strip().upper().replace(" ", "")
+    for suffix, mult in (("TB", 1024**4), ("GB", 1024**3), ("MB", 1024**2), ("KB", 1024), ("T", 1024**4),
+                         ("G", 1024**3), ("M", 1024**2), ("K", 1024), ("B", 1)):
+        if t.endswith(suffix):
+            return int(float(t[:-len(suffix)]) * mult)
+    return int(float(t))
+
 def est_output_name(in_path, dpi):
     base, _ = os.path.splitext(in_path)
     return f"{base}_compressed_{dpi}dpi.pdf"
 
 # -------- Core compression (rasterize pages) --------
-def compress_pdf_raster(in_path, out_path, dpi=144, jpeg_quality=70, grayscale=False, progress_cb=None):
+def render_page_pixmap(page, mat, grayscale=False):
+    """Rasterize one page straight into the target colorspace (gray is a third of the RGB buffer)."""
+    cs = fitz.csGRAY if grayscale else fitz.csRGB
+    return page.get_pixmap(matrix=mat, colorspace=cs, alpha=False)  # render page
+
+def pixmap_to_image(pix):
+    """Wrap the pixmap's sample buffer as a PIL image without copying it; keep pix alive while img is used."""
+    mode = "L" if pix.n == 1 else "RGB"
+    # Stride 0 (= tightly packed) lets Pillow map "L" buffers directly; RGB is unpacked once into Pillow's layout
+    stride = 0 if pix.stride == pix.width * pix.n else pix.stride
+    return Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, stride, 1)
+
+def encode_jpeg(img, jpeg_quality, grayscale):
+    """JPEG-encode a PIL image and return the bytes."""
+    if grayscale and img.mode != "L":
+        img = img.convert("L")  # grayscale
+        # Pillow will convert back to RGB when saved as JPEG unless we keep 'L'
+        # PyMuPDF will embed as JPEG/PNG depending—keep as L to promote smaller size
+
+    # Save to in-memory bytes as JPEG to control quality
+    buf = io.BytesIO()
+    # If page has transparency, above used alpha=False; safe for most PDFs
+    img.save(buf, format="JPEG", quality=jpeg_quality, optimize=True)
+    return buf.getvalue()
+
+def pixmap_to_jpeg(pix, jpeg_quality, grayscale, encoder="pil"):
+    """
+    JPEG-encode a rendered pixmap.
+    - encoder="pil": Pillow reads the pixmap buffer in place (default; smaller and faster output)
+    - encoder="fitz": MuPDF's built-in JPEG writer, no Pillow involved
+    """
+    if grayscale and pix.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    if encoder == "fitz":
+        return pix.tobytes("jpeg", jpg_quality=jpeg_quality)
+    return encode_jpeg(pixmap_to_image(pix), jpeg_quality, grayscale)
+
+def render_page_jpeg(page, mat, jpeg_quality, grayscale, encoder="pil"):
+    """Render one page and return its JPEG bytes (shared by the serial and parallel paths)."""
+    return pixmap_to_jpeg(render_page_pixmap(page, mat, grayscale), jpeg_quality, grayscale, encoder)
+
+def insert_page_jpeg(dst, width, height, img_bytes):
+    """Append a page of the given size with the JPEG as a full-page image."""
+    new_page = dst.new_page(width=width, height=height)
+    rect = fitz.Rect(0, 0, width, height)
+    new_page.insert_image(rect, stream=img_bytes)
+
+# Per-process state for the parallel path: each worker opens its own fitz document once
+_worker_doc = None
+_worker_opts = None
+
+def _init_render_worker(in_path, dpi, jpeg_quality, grayscale, encoder="pil"):
+    global _worker_doc, _worker_opts
+    zoom = dpi / 72.0
+    _worker_doc = fitz.open(in_path)
+    _worker_opts = (fitz.Matrix(zoom, zoom), jpeg_quality, grayscale, encoder)
+
+def _render_page_in_worker(index):
+    mat, jpeg_quality, grayscale, encoder = _worker_opts
+    page = _worker_doc[index]
+    img_bytes = render_page_jpeg(page, mat, jpeg_quality, grayscale, encoder)
+    return index, page.rect.width, page.rect.height, img_bytes
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+def pages_per_chunk(src, dpi, memory_budget_mb, workers=1):
+    """
+    How many pages a streaming chunk may hold within memory_budget_mb.
+    Uses the largest page's raw RGB pixmap as the per-page cost: a JPEG is never
+    bigger than that, and each busy worker holds roughly pixmap + PIL copy + JPEG.
+    """
+    zoom = dpi / 72.0
+    largest = max((r.width * zoom) * (r.height * zoom) * 3 for r in (src.page_cropbox(i) for i in range(len(src))))
+    budget = memory_budget_mb * 1024 * 1024 - largest * 3 * max(1, workers)
+    return max(1, int(budget // largest))
+
+def _iter_encoded_pages(src, indices, mat, jpeg_quality, grayscale, encoder, pool, on_done):
+    """Yield (width, height, jpeg_bytes) for indices in page order; on_done() fires as each page finishes."""
+    if pool is None:
+        for i in indices:
+            page = src[i]
+            img_bytes = render_page_jpeg(page, mat, jpeg_quality, grayscale, encoder)
+            on_done()
+            yield page.rect.width, page.rect.height, img_bytes
+        return
+
+    # Pages finish out of order; hold them until every earlier page has been yielded
+    pending = {}
+    next_index = indices[0]
+    futures = [pool.submit(_render_page_in_worker, i) for i in indices]
+    for fut in as_completed(futures):
+        index, width, height, img_bytes = fut.result()
+        pending[index] = (width, height, img_bytes)
+        on_done()
+        while next_index in pending:
+            yield pending.pop(next_index)
+            next_index += 1
+
+def compress_pdf_raster(in_path, out_path, dpi=144, jpeg_quality=70, grayscale=False, progress_cb=None, workers=1,
+                        memory_budget_mb=None, chunk_pages=None, encoder="pil"):
     """
     Re-renders each page to an image at specified DPI and writes back into a compact PDF.
     - dpi: 96–200 is a good practical range
     - jpeg_quality: 40–85 typical (PyMuPDF embeds as JPEG where applicable)
     - grayscale: optional extra shrink
+    - workers: >1 renders/encodes pages in a process pool; output is identical to the serial path
+    - memory_budget_mb / chunk_pages: streaming mode. Pages are encoded and appended to out_path
+      in fixed-size chunks (incremental saves), so peak memory stays flat regardless of page count.
+    - encoder: "pil" (default) or "fitz", see pixmap_to_jpeg
     """
     zoom = dpi / 72.0
     mat = fitz.Matrix(zoom, zoom)
 
     src = fitz.open(in_path)
-    dst = fitz.open()
+    total = len(src)
 
-    for i, page in enumerate(src, start=1):
-        pix = page.get_pixmap(matrix=mat, alpha=False)  # render page
-        mode = "RGB"
-        img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
+    streaming = memory_budget_mb is not None or chunk_pages is not None
+    if not streaming:
+        chunk_pages = total
+    elif chunk_pages is None:
+        chunk_pages = pages_per_chunk(src, dpi, memory_budget_mb, workers)
 
-        if grayscale:
-            img = img.convert("L")  # grayscale
-            # Pillow will convert back to RGB when saved as JPEG unless we keep 'L'
-            # PyMuPDF will embed as JPEG/PNG depending—keep as L to promote smaller size
+    pool = None
+    if workers > 1 and total > 1:
+        pool = ProcessPoolExecutor(max_workers=min(workers, total), initializer=_init_render_worker,
+                                   initargs=(in_path, dpi, jpeg_quality, grayscale, encoder))
 
-        # Save to in-memory bytes as JPEG to control quality, then insert
-        import io
-        buf = io.BytesIO()
-        # If page has transparency, above used alpha=False; safe for most PDFs
-        img.save(buf, format="JPEG", quality=jpeg_quality, optimize=True)
-        img_bytes = buf.getvalue()
+    done = 0
 
-        # Insert the JPEG as a full-page image
-        new_page = dst.new_page(width=page.rect.width, height=page.rect.height)
-        rect = fitz.Rect(0, 0, page.rect.width, page.rect.height)
-        new_page.insert_image(rect, stream=img_bytes)
+    def on_done():
+        nonlocal done
+        done += 1
+        if progress_cb:
+            progress_cb(done, total)
+
+    try:
+        for start in range(0, max(total, 1), chunk_pages):
+            indices = range(start, min(start + chunk_pages, total))
+            # First chunk starts a fresh document; later chunks reopen the file and append to it
+            dst = fitz.open() if start == 0 else fitz.open(out_path)
+
+            for width, height, img_bytes in _iter_encoded_pages(src, indices, mat, jpeg_quality, grayscale, encoder, pool, on_done):
+                insert_page_jpeg(dst, width, height, img_bytes)
+
+            if start == 0:
+                # Final save with aggressive cleanup/deflate
+                dst.save(out_path, deflate=True, clean=True, garbage=4)  # no linear
+            else:
+                # Only the new chunk's objects are written; earlier pages stay on disk
+                dst.save(out_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, deflate=True)
+            dst.close()
+
+            if streaming:
+                fitz.TOOLS.store_shrink(100)  # drop MuPDF's cached fonts/images from the source pages
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        src.close()
+
+# -------- Content-aware (hybrid) compression --------
+SCAN_IMAGE_COVERAGE = 0.85  # images covering this much of the page look like a scan
+SCAN_MAX_TEXT_CHARS = 20    # ...unless the page also carries real (or OCR) text
+DOWNSAMPLE_SLACK = 1.25     # only touch images above dpi * slack
+
+def image_effective_dpi(info):
+    """DPI at which an image is actually placed on the page (from page.get_image_info())."""
+    bbox = fitz.Rect(info["bbox"])
+    if bbox.is_empty:
+        return 0
+    return max(info["width"] / (bbox.width / 72.0), info["height"] / (bbox.height / 72.0))
+
+def classify_page(page, dpi):
+    """
+    Cheap inspection of one page. Returns (strategy, reason) where strategy is
+    'raster' (scan-like: full-page images, no text), 'downsample' (embedded images
+    above the target DPI) or 'copy' (text/vector page, pass through untouched).
+    """
+    page_area = abs(page.rect) or 1
+    infos = page.get_image_info(xrefs=True)
+    image_area = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in infos)
+    coverage = min(1.0, image_area / page_area)
+    text_chars = len(page.get_text("text").strip())
+    max_dpi = max((image_effective_dpi(info) for info in infos), default=0)
+
+    if coverage >= SCAN_IMAGE_COVERAGE and text_chars <= SCAN_MAX_TEXT_CHARS:
+        return "raster", f"scan-like: images cover {coverage:.0%}, {text_chars} text chars"
+    if max_dpi > dpi * DOWNSAMPLE_SLACK:
+        return "downsample", f"{len(infos)} image(s), up to {max_dpi:.0f} dpi, {text_chars} text chars"
+    if infos:
+        return "copy", f"{len(infos)} image(s) already ≤ {max_dpi:.0f} dpi, {text_chars} text chars"
+    return "copy", f"text/vector only, {text_chars} text chars"
+
+def image_placements(doc, page_numbers):
+    """
+    {xref: (effective dpi at its largest placement, first page number)} over every placement of
+    each image on the given pages. The largest placement has the lowest effective dpi, so a shared
+    image is judged by its biggest use, not by whichever page shows it first.
+    """
+    placements = {}
+    for pno in page_numbers:
+        for info in doc[pno].get_image_info(xrefs=True):
+            xref = info["xref"]
+            if not xref:
+                continue
+            eff_dpi = image_effective_dpi(info)
+            if xref in placements:
+                placements[xref] = (min(eff_dpi, placements[xref][0]), placements[xref][1])
+            else:
+                placements[xref] = (eff_dpi, pno)
+    return placements
+
+def downsample_images(doc, placements, dpi, jpeg_quality, grayscale):
+    """
+    Re-encode, in place, every image that is above dpi even at its largest placement (see image_placements).
+    Images with soft masks, stencil masks or explicit/color-key masks are left alone.
+    Returns {page number: bytes saved}, each image counted on the first page that shows it.
+    """
+    saved = {}
+    for xref, (eff_dpi, pno) in placements.items():
+        if eff_dpi <= dpi * DOWNSAMPLE_SLACK:
+            continue
+        if (doc.xref_get_key(xref, "SMask")[0] != "null" or doc.xref_get_key(xref, "Mask")[0] != "null"
+                or doc.xref_get_key(xref, "ImageMask")[1] == "true"):
+            continue
+
+        pix = fitz.Pixmap(doc, xref)
+        if pix.alpha or pix.n not in (1, 3):
+            pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+        img = Image.frombytes("L" if pix.n == 1 else "RGB", [pix.width, pix.height], pix.samples)
+
+        scale = dpi / eff_dpi
+        img = img.resize((max(1, round(pix.width * scale)), max(1, round(pix.height * scale))), Image.LANCZOS)
+        img_bytes = encode_jpeg(img, jpeg_quality, grayscale)
+
+        old_len = len(doc.xref_stream_raw(xref))
+        if len(img_bytes) < old_len:
+            doc[pno].replace_image(xref, stream=img_bytes)
+            saved[pno] = saved.get(pno, 0) + old_len - len(img_bytes)
+    return saved
+
+def compress_pdf_hybrid(in_path, out_path, dpi=144, jpeg_quality=70, grayscale=False, progress_cb=None, encoder="pil"):
+    """
+    Per-page strategy instead of rasterizing everything (see classify_page):
+    text/vector pages are copied untouched (still searchable), oversized embedded
+    images are downsampled in place, and only scan-like pages are re-rendered.
+    Downsampling runs once all pages are copied, so each image is sized for its
+    largest placement anywhere in the document.
+    Returns a report: list of (page_number, strategy, reason).
+    """
+    zoom = dpi / 72.0
+    mat = fitz.Matrix(zoom, zoom)
+
+    src = fitz.open(in_path)
+    dst = fitz.open()
+    total = len(src)
+    report = []
+    copied = []  # dst page numbers of pages copied from src (their images may be downsampled)
+
+    for i, page in enumerate(src):
+        strategy, reason = classify_page(page, dpi)
+        if strategy == "raster":
+            img_bytes = render_page_jpeg(page, mat, jpeg_quality, grayscale, encoder)
+            insert_page_jpeg(dst, page.rect.width, page.rect.height, img_bytes)
+        else:
+            # final=False keeps the graft map, so fonts/images shared between pages are copied once
+            dst.insert_pdf(src, from_page=i, to_page=i, final=False)
+            copied.append(len(dst) - 1)
+        report.append((i + 1, strategy, reason))
 
         if progress_cb:
-            progress_cb(i, len(src))
+            progress_cb(i + 1, total)
+
+    if any(strategy == "downsample" for _, strategy, _ in report):
+        saved = downsample_images(dst, image_placements(dst, copied), dpi, jpeg_quality, grayscale)
+        report = [(n, strategy, reason + f", saved {human_size(saved[n - 1])}" if saved.get(n - 1) else reason)
+                  for n, strategy, reason in report]
 
-    # Final save with aggressive cleanup/deflate
     dst.save(out_path, deflate=True, clean=True, garbage=4)  # no linear
     dst.close()
     src.close()
+    return report
+
+# -------- Target size search --------
+DPI_CHOICES = (200, 170, 144, 120, 100, 86, 72)
+QUALITY_CHOICES = (40, 50, 60, 70, 78, 85)
+PAGE_OVERHEAD_BYTES = 600  # page object, content stream and xref entry per output page
+
+def sample_page_indices(total, count):
+    """Evenly spread page indices (always includes the first page)."""
+    if total <= count:
+        return list(range(total))
+    step = total / count
+    return sorted({int(i * step) for i in range(count)})
+
+def find_settings_for_target(in_path, target_bytes, sample_pages=8, dpi_choices=DPI_CHOICES,
+                             quality_choices=QUALITY_CHOICES, allow_grayscale=True, progress_cb=None, encoder="pil"):
+    """
+    Estimate output size from a sample of pages and pick the best-looking settings under target_bytes.
+    Prefers colour over grayscale, then higher DPI, then higher quality. Each sample page is rendered
+    at most once per DPI; the pixmap is reused for every quality/grayscale candidate.
+    Returns (dpi, jpeg_quality, grayscale, estimated_bytes, fits).
+    """
+    src = fitz.open(in_path)
+    total = len(src)
+    indices = sample_page_indices(total, sample_pages)
+    qualities = sorted(quality_choices)
+
+    rendered = {}  # (page index, dpi, grayscale) -> pixmap; gray ones are converted from the RGB render
+    estimates = {}  # (dpi, quality, grayscale) -> estimated output bytes
+
+    def estimate(dpi, q, gray):
+        key = (dpi, q, gray)
+        if key not in estimates:
+            zoom = dpi / 72.0
+            mat = fitz.Matrix(zoom, zoom)
+            sample_bytes = 0
+            for i in indices:
+                if (i, dpi, False) not in rendered:
+                    rendered[(i, dpi, False)] = render_page_pixmap(src[i], mat)
+                if gray and (i, dpi, True) not in rendered:
+                    rendered[(i, dpi, True)] = fitz.Pixmap(fitz.csGRAY, rendered[(i, dpi, False)])
+                pix = rendered[(i, dpi, gray)]
+                sample_bytes += len(pixmap_to_jpeg(pix, q, gray, encoder)) + PAGE_OVERHEAD_BYTES
+            estimates[key] = int(sample_bytes * total / max(1, len(indices)))
+            if progress_cb:
+                progress_cb(dpi, q, gray, estimates[key])
+        return estimates[key]
+
+    try:
+        for gray in ((False, True) if allow_grayscale else (False,)):
+            for dpi in sorted(dpi_choices, reverse=True):
+                # Size grows with quality, so binary-search the highest quality that fits
+                if estimate(dpi, qualities[0], gray) > target_bytes:
+                    continue
+                lo, hi = 0, len(qualities) - 1
+                while lo < hi:
+                    mid = (lo + hi + 1) // 2
+                    if estimate(dpi, qualities[mid], gray) <= target_bytes:
+                        lo = mid
+                    else:
+                        hi = mid - 1
+                q = qualities[lo]
+                return dpi, q, gray, estimate(dpi, q, gray), True
+        # Nothing fits: hand back the smallest candidate so the caller can still compress
+        dpi, q, gray = min(dpi_choices), qualities[0], allow_grayscale
+        return dpi, q, gray, estimate(dpi, q, gray), False
+    finally:
+        src.close()
+
+def compress_to_target(in_path, target_bytes, out_path=None, progress_cb=None, search_cb=None, **kwargs):
+    """
+    Search settings on a page sample, then do a single full pass with them.
+    Returns (out_path, dpi, jpeg_quality, grayscale, estimated_bytes, fits).
+    """
+    dpi, q, gray, est, fits = find_settings_for_target(in_path, target_bytes, progress_cb=search_cb,
+                                                       encoder=kwargs.get("encoder", "pil"))
+    out_path = out_path or est_output_name(in_path, dpi)
+    compress_pdf_raster(in_path, out_path, dpi=dpi, jpeg_quality=q, grayscale=gray, progress_cb=progress_cb, **kwargs)
+    return out_path, dpi, q, gray, est, fits
+
+# -------- Batch folder compression --------
+MANIFEST_NAME = ".pdfcompress_manifest.jsonl"
+POOL_RESTARTS = 2  # pools replaced after a worker crash before the remaining files run one at a time
+_OUTPUT_NAME_RE = re.compile(r"_compressed_\d+dpi\.pdf$", re.IGNORECASE)
+
+def find_pdfs(root):
+    """All PDFs under root, skipping files this tool produced."""
+    found = []
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(".pdf") and not _OUTPUT_NAME_RE.search(name):
+                found.append(os.path.join(dirpath, name))
+    return found
+
+def manifest_key(path, size, mtime, settings):
+    return json.dumps([os.path.abspath(path), size, mtime, settings], sort_keys=True)
+
+def load_manifest(manifest_path):
+    """Read a JSON-lines manifest; the last record for a key wins. Truncated trailing lines are ignored."""
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # half-written line from an interrupted run
+            records[manifest_key(rec["path"], rec["size"], rec["mtime"], rec["settings"])] = rec
+    return records
+
+def _batch_job(path, settings):
+    """Compress one file inside a pool worker; returns the fields to record in the manifest."""
+    t0 = time.time()
+    try:
+        if settings.get("target_size"):
+            out_path = compress_to_target(path, settings["target_size"], memory_budget_mb=settings.get("memory_budget_mb"),
+                                          encoder=settings.get("encoder", "pil"))[0]
+        elif settings["mode"] == "hybrid":
+            out_path = est_output_name(path, settings["dpi"])
+            compress_pdf_hybrid(path, out_path, dpi=settings["dpi"], jpeg_quality=settings["jpeg_quality"],
+                                grayscale=settings["grayscale"], encoder=settings.get("encoder", "pil"))
+        else:
+            out_path = est_output_name(path, settings["dpi"])
+            compress_pdf_raster(path, out_path, dpi=settings["dpi"], jpeg_quality=settings["jpeg_quality"],
+                                grayscale=settings["grayscale"], memory_budget_mb=settings.get("memory_budget_mb"),
+                                encoder=settings.get("encoder", "pil"))
+        return {"status": "done", "output": out_path, "out_size": os.path.getsize(out_path),
+                "seconds": round(time.time() - t0, 3)}
+    except Exception as e:
+        return {"status": "failed", "error": str(e), "seconds": round(time.time() - t0, 3)}
+
+def compress_folder(root, settings, workers=None, manifest_path=None, log=print):
+    """
+    Compress every PDF under root across a process pool, largest files first.
+    Each finished file is appended to a JSON-lines manifest keyed by (path, size, mtime, settings),
+    so a rerun skips files already done with the same settings and retries failures.
+    Returns a summary dict.
+    """
+    workers = workers or default_workers()
+    manifest_path = manifest_path or os.path.join(root, MANIFEST_NAME)
+    done_before = load_manifest(manifest_path)
+
+    jobs = []
+    skipped = 0
+    for path in find_pdfs(root):
+        st = os.stat(path)
+        key = manifest_key(path, st.st_size, st.st_mtime, settings)
+        rec = done_before.get(key)
+        if rec and rec["status"] == "done" and os.path.exists(rec["output"]):
+            skipped += 1
+            continue
+        jobs.append((st.st_size, st.st_mtime, path))
+    jobs.sort(reverse=True)  # largest first keeps the pool busy until the end
+
+    summary = {"files": len(jobs), "skipped": skipped, "done": 0, "failed": 0,
+               "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+    log(f"{len(jobs)} to compress, {skipped} already up to date ({workers} workers)")
+    t0 = time.time()
+
+    n = 0
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        def record(job, result):
+            nonlocal n
+            n += 1
+            size, mtime, path = job
+            rec = {"path": os.path.abspath(path), "size": size, "mtime": mtime, "settings": settings}
+            rec.update(result)
+            manifest.write(json.dumps(rec) + "\n")
+            manifest.flush()
+
+            if rec["status"] == "done":
+                summary["done"] += 1
+                summary["bytes_in"] += size
+                summary["bytes_out"] += rec["out_size"]
+                log(f"[{n}/{len(jobs)}] {path}: {human_size(size)} -> {human_size(rec['out_size'])}")
+            else:
+                summary["failed"] += 1
+                log(f"[{n}/{len(jobs)}] {path}: FAILED ({rec['error']})")
+
+        # A crashed worker (e.g. a segfault in MuPDF) breaks the whole pool and fails every file still
+        # queued with it. Those files are retried in a fresh pool; after POOL_RESTARTS crashes the rest
+        # run one per pool, so only the file that actually crashes its worker is recorded as failed.
+        queue = jobs
+        restarts = 0
+        while queue:
+            isolate = restarts >= POOL_RESTARTS
+            batches = [[job] for job in queue] if isolate else [queue]
+            queue = []
+            for batch in batches:
+                with ProcessPoolExecutor(max_workers=1 if isolate else workers) as pool:
+                    futures = {pool.submit(_batch_job, job[2], settings): job for job in batch}
+                    for fut in as_completed(futures):
+                        try:
+                            result = fut.result()
+                        except BrokenProcessPool:
+                            if isolate:
+                                result = {"status": "failed", "error": "worker process crashed", "seconds": 0.0}
+                            else:
+                                queue.append(futures[fut])
+                                continue
+                        except Exception as e:
+                            result = {"status": "failed", "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+                        record(futures[fut], result)
+            if queue:
+                restarts += 1
+                queue.sort(reverse=True)
+                log(f"Worker process crashed; retrying {len(queue)} file(s)"
+                    + (" one at a time" if restarts >= POOL_RESTARTS else ""))
+
+    summary["seconds"] = time.time() - t0
+    return summary
+
+def format_batch_summary(summary):
+    secs = summary["seconds"] or 1e-9
+    saved = summary["bytes_in"] - summary["bytes_out"]
+    return (
+        f"Compressed {summary['done']} file(s), {summary['failed']} failed, {summary['skipped']} skipped.\n"
+        f"Input {human_size(summary['bytes_in'])} -> output {human_size(summary['bytes_out'])} "
+        f"(saved {human_size(max(saved, 0))})\n"
+        f"Time {summary['seconds']:.1f}s: {summary['done'] / secs:.2f} files/s, "
+        f"{human_size(summary['bytes_in'] / secs)}/s"
+    )
 
 # -------- Tkinter GUI --------
 class App:
@@ -90,17 +571,38 @@ class App:
         self.gray_chk = Checkbutton(master, text="Convert to Grayscale (smaller)", variable=self.gray_flag)
         self.gray_chk.grid(row=2, column=1, padx=10, pady=(0,8), sticky="w")
 
+        # Parallel workers
+        Label(master, text="Worker processes:").grid(row=3, column=0, sticky="w", padx=10)
+        self.workers_slider = Scale(master, from_=1, to=default_workers(), orient=HORIZONTAL, length=320)
+        self.workers_slider.set(default_workers())
+        self.workers_slider.grid(row=3, column=1, padx=10, pady=(0,8), sticky="w")
+
+        # Streaming (bounded memory) option
+        self.stream_flag = IntVar(value=0)
+        self.stream_chk = Checkbutton(master, text=f"Low-memory streaming (~{STREAM_BUDGET_MB} MB budget)", variable=self.stream_flag)
+        self.stream_chk.grid(row=4, column=1, padx=10, pady=(0,8), sticky="w")
+
+        # Content-aware mode
+        self.hybrid_flag = IntVar(value=0)
+        self.hybrid_chk = Checkbutton(master, text="Smart mode (keep text pages, rasterize scans only)", variable=self.hybrid_flag)
+        self.hybrid_chk.grid(row=5, column=1, padx=10, pady=(0,8), sticky="w")
+
+        # Target size (overrides DPI/quality/grayscale when set)
+        Label(master, text="Target size (e.g. 10MB, optional):").grid(row=6, column=0, sticky="w", padx=10)
+        self.target_var = StringVar(value="")
+        Entry(master, textvariable=self.target_var, width=12).grid(row=6, column=1, padx=10, pady=(0,8), sticky="w")
+
         # Choose PDF
-        Button(master, text="Choose PDF…", command=self.choose_pdf).grid(row=3, column=0, padx=10, pady=6, sticky="w")
-        Label(master, textvariable=self.sel_var, wraplength=420).grid(row=3, column=1, padx=10, pady=6, sticky="w")
+        Button(master, text="Choose PDF…", command=self.choose_pdf).grid(row=7, column=0, padx=10, pady=6, sticky="w")
+        Label(master, textvariable=self.sel_var, wraplength=420).grid(row=7, column=1, padx=10, pady=6, sticky="w")
 
         # Compress
-        Button(master, text="Compress", command=self.on_compress).grid(row=4, column=0, padx=10, pady=8, sticky="w")
-        Label(master, text="Output file:").grid(row=5, column=0, padx=10, sticky="w")
-        Label(master, textvariable=self.out_var, wraplength=420).grid(row=5, column=1, padx=10, sticky="w")
+        Button(master, text="Compress", command=self.on_compress).grid(row=8, column=0, padx=10, pady=8, sticky="w")
+        Label(master, text="Output file:").grid(row=9, column=0, padx=10, sticky="w")
+        Label(master, textvariable=self.out_var, wraplength=420).grid(row=9, column=1, padx=10, sticky="w")
 
         # Status
-        Label(master, textvariable=self.status, fg="#064", wraplength=520, justify="left").grid(row=6, column=0, columnspan=2, padx=10, pady=(4,12), sticky="w")
+        Label(master, textvariable=self.status, fg="#064", wraplength=520, justify="left").grid(row=10, column=0, columnspan=2, padx=10, pady=(4,12), sticky="w")
 
         for i in range(2):
             master.grid_columnconfigure(i, weight=1)
@@ -120,23 +622,52 @@ class App:
         dpi = int(self.dpi_slider.get())
         q = int(self.q_slider.get())
         gray = bool(self.gray_flag.get())
+        workers = int(self.workers_slider.get())
+        budget = STREAM_BUDGET_MB if self.stream_flag.get() else None
+        hybrid = bool(self.hybrid_flag.get())
+        target = None
+        if self.target_var.get().strip():
+            try:
+                target = parse_size(self.target_var.get())
+            except ValueError:
+                self.status.set("Target size must look like 10MB, 750KB or a byte count.")
+                return
 
         out_path = est_output_name(self.pdf_path, dpi)
-        self.out_var.set(out_path)
-        self.status.set("Compressing…")
+        self.out_var.set("(chosen after size search)" if target else out_path)
+        self.status.set("Searching settings…" if target else "Compressing…")
 
         def progress_cb(done, total):
             self.status.set(f"Compressing… page {done}/{total}")
 
+        def search_cb(s_dpi, s_q, s_gray, est):
+            self.status.set(f"Searching settings… {s_dpi} dpi, q{s_q}{' gray' if s_gray else ''} ≈ {human_size(est)}")
+
         def worker():
             try:
                 before = os.path.getsize(self.pdf_path)
-                compress_pdf_raster(self.pdf_path, out_path, dpi=dpi, jpeg_quality=q, grayscale=gray, progress_cb=progress_cb)
-                after = os.path.getsize(out_path) if os.path.exists(out_path) else 0
+                note = ""
+                if target:
+                    result_path, s_dpi, s_q, s_gray, est, fits = compress_to_target(
+                        self.pdf_path, target, progress_cb=progress_cb, search_cb=search_cb,
+                        workers=workers, memory_budget_mb=budget)
+                    self.out_var.set(result_path)
+                    note = (f"\nChosen: {s_dpi} dpi, quality {s_q}{', grayscale' if s_gray else ''}"
+                            f"{'' if fits else ' (smallest setting; target not reachable)'}")
+                elif hybrid:
+                    result_path = out_path
+                    report = compress_pdf_hybrid(self.pdf_path, out_path, dpi=dpi, jpeg_quality=q, grayscale=gray, progress_cb=progress_cb)
+                    counts = {k: sum(1 for _, st, _ in report if st == k) for k in ("copy", "downsample", "raster")}
+                    note = "\nPages: " + ", ".join(f"{k} {v}" for k, v in counts.items())
+                else:
+                    result_path = out_path
+                    compress_pdf_raster(self.pdf_path, out_path, dpi=dpi, jpeg_quality=q, grayscale=gray, progress_cb=progress_cb, workers=workers,
+                                        memory_budget_mb=budget)
+                after = os.path.getsize(result_path) if os.path.exists(result_path) else 0
                 ratio = (after / before) if before else 1.0
                 self.status.set(
                     f"Done!\nOriginal: {human_size(before)}\nCompressed: {human_size(after)}\n"
-                    f"Ratio: {ratio:.2f}x ({(1-ratio)*100:.1f}% smaller)"
+                    f"Ratio: {ratio:.2f}x ({(1-ratio)*100:.1f}% smaller){note}"
                 )
             except Exception as e:
                 self.status.set(f"Error: {e}")
@@ -149,5 +680,82 @@ def main():
     App(root)
     root.mainloop()
 
+# -------- Command line --------
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Compress a PDF by re-rendering its pages as JPEG (no Ghostscript).")
+    parser.add_argument("input", help="PDF to compress, or a folder to compress every PDF under it (batch mode)")
+    parser.add_argument("-o", "--output", help="Output PDF (default: <input>_compressed_<dpi>dpi.pdf)")
+    parser.add_argument("--dpi", type=int, default=144, help="Render DPI (default 144)")
+    parser.add_argument("-q", "--quality", type=int, default=70, help="JPEG quality 40–85 (default 70)")
+    parser.add_argument("--grayscale", action="store_true", help="Convert pages to grayscale")
+    parser.add_argument("--mode", choices=["raster", "hybrid"], default="raster",
+                        help="raster: re-render every page; hybrid: copy text pages, downsample images, rasterize scans only")
+    parser.add_argument("--target-size", help="Pick DPI/quality/grayscale automatically to stay under this size, e.g. 10MB")
+    parser.add_argument("-j", "--workers", type=int, default=default_workers(), help="Worker processes (default: CPU count)")
+    parser.add_argument("--memory-budget", type=int, metavar="MB", help="Stream pages in chunks to stay within this memory budget")
+    parser.add_argument("--encoder", choices=["pil", "fitz"], default="pil", help="JPEG encoder (default: pil)")
+    parser.add_argument("--manifest", help=f"Batch mode: resume manifest (default: <folder>/{MANIFEST_NAME})")
+    args = parser.parse_args(argv)
+    if args.mode == "hybrid" and args.target_size:
+        parser.error("--target-size is only supported with --mode raster")
+    target = None
+    if args.target_size:
+        try:
+            target = parse_size(args.target_size)
+        except ValueError:
+            parser.error(f"invalid --target-size '{args.target_size}' (use e.g. 10MB, 750KB or a byte count)")
+        if target <= 0:
+            parser.error("--target-size must be greater than zero")
+
+    if os.path.isdir(args.input):
+        if args.output:
+            parser.error("-o/--output cannot be used with a folder; outputs go next to each input")
+        settings = {"mode": args.mode, "dpi": args.dpi, "jpeg_quality": args.quality, "grayscale": args.grayscale,
+                    "target_size": target,
+                    "memory_budget_mb": args.memory_budget, "encoder": args.encoder}
+        summary = compress_folder(args.input, settings, workers=args.workers, manifest_path=args.manifest)
+        print(format_batch_summary(summary))
+        return 1 if summary["failed"] else 0
+
+    if not os.path.isfile(args.input):
+        print(f"Error: input file not found: {args.input}", file=sys.stderr)
+        return 1
+
+    def progress_cb(done, total):
+        print(f"\rpage {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    before = os.path.getsize(args.input)
+    if target:
+        out_path, dpi, q, gray, est, fits = compress_to_target(
+            args.input, target, out_path=args.output, progress_cb=progress_cb,
+            workers=args.workers, memory_budget_mb=args.memory_budget, encoder=args.encoder)
+        print(file=sys.stderr)
+        print(f"Chosen settings: {dpi} dpi, quality {q}{', grayscale' if gray else ''} "
+              f"(estimated {human_size(est)}, target {human_size(target)})")
+        if not fits:
+            print("Warning: target not reachable; used the smallest settings.", file=sys.stderr)
+    elif args.mode == "hybrid":
+        out_path = args.output or est_output_name(args.input, args.dpi)
+        report = compress_pdf_hybrid(args.input, out_path, dpi=args.dpi, jpeg_quality=args.quality,
+                                     grayscale=args.grayscale, progress_cb=progress_cb, encoder=args.encoder)
+        print(file=sys.stderr)
+        for page_no, strategy, reason in report:
+            print(f"page {page_no:>5}  {strategy:<10}  {reason}")
+        counts = {k: sum(1 for _, st, _ in report if st == k) for k in ("copy", "downsample", "raster")}
+        print(", ".join(f"{k}: {v}" for k, v in counts.items()))
+    else:
+        out_path = args.output or est_output_name(args.input, args.dpi)
+        compress_pdf_raster(args.input, out_path, dpi=args.dpi, jpeg_quality=args.quality, grayscale=args.grayscale,
+                            progress_cb=progress_cb, workers=args.workers, memory_budget_mb=args.memory_budget,
+                            encoder=args.encoder)
+        print(file=sys.stderr)
+
+    after = os.path.getsize(out_path)
+    print(f"{out_path}: {human_size(before)} -> {human_size(after)}")
+    return 0
+
 if __name__ == "__main__":
+    # Arguments -> command line; no arguments -> GUI
+    if len(sys.argv) > 1:
+        sys.exit(cli())
     main()
@@ -1,11 +1,22 @@
 #do pip install pypdf
 #!/usr/bin/env python3
 import argparse
-import glob
+import hashlib
+import json
 import os
+import re
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
+from io import BytesIO
 from pathlib import Path
 
 from pypdf import PdfReader, PdfWriter, PageObject, Transformation
+from pypdf.generic import (
+    ArrayObject, ContentStream, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject,
+    StreamObject,
+)
 
 A4 = (595.275590551, 841.88976378)      # 210 x 297 mm in points (72 dpi)
 LETTER = (612.0, 792.0)                 # 8.5 x 11 in in points
@@ -15,25 +26,289 @@ SIZES = {
     "LETTER": LETTER,
 }
 
+INHERITABLE = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+_SELECTOR_RE = re.compile(r"^(.*)\[([^\[\]]*)\]$")
+_NATURAL_RE = re.compile(r"\d+|\D+")
+
+DEFAULT_CACHE = Path.home() / ".pdfmerger_cache.jsonl"
+SCAN_THREADS = 16  # directory listings are I/O-bound; network mounts benefit from many in flight
+
+def parse_page_ranges(spec: str):
+    """'1-3,10,20-' -> ((1, 3), (10, 10), (20, None)). Page numbers are 1-based; '-5' means 1-5."""
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                a, b = part.split("-", 1)
+                start = int(a) if a.strip() else 1
+                end = int(b) if b.strip() else None
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise SystemExit(f"Bad page range '{part}' in '{spec}'.") from None
+        if start < 1 or (end is not None and end < start):
+            raise SystemExit(f"Bad page range '{part}' in '{spec}'.")
+        ranges.append((start, end))
+    if not ranges:
+        raise SystemExit(f"Empty page selection '{spec}'.")
+    return tuple(ranges)
+
+def split_selector(arg: str):
+    """'file.pdf[1-3,10]' -> ('file.pdf', ranges); plain paths (even ones containing brackets) -> (arg, None)."""
+    m = _SELECTOR_RE.match(arg)
+    if m and not os.path.exists(arg):
+        return m.group(1), parse_page_ranges(m.group(2))
+    return arg, None
+
+def select_page_indices(ranges, count: int):
+    """0-based page indices for ranges, clipped to the document's page count."""
+    indices = []
+    for start, end in ranges:
+        end = count if end is None else min(end, count)
+        indices.extend(range(start - 1, end))
+    return indices
+
+def page_count(reader: PdfReader) -> int:
+    """Page count from the root /Pages node, without flattening the page tree."""
+    return int(reader.trailer["/Root"]["/Pages"]["/Count"])
+
+def lazy_page(reader: PdfReader, index: int) -> PageObject:
+    """
+    Load one page by descending the page tree with /Count, touching only the nodes on
+    the way. reader.pages[i] would flatten (and parse every node of) the whole tree first.
+    Inherited attributes are copied onto the page, as pypdf's own flattening does.
+    """
+    node = reader.trailer["/Root"]["/Pages"]
+    inherited = {}
+    while True:
+        for attr in INHERITABLE:
+            if attr in node:
+                inherited[attr] = node.raw_get(attr)
+        for kid_ref in node["/Kids"]:
+            kid = kid_ref.get_object()
+            if "/Kids" in kid:
+                count = int(kid["/Count"])
+                if index < count:
+                    node = kid
+                    break
+                index -= count
+            elif index == 0:
+                page = PageObject(reader, kid_ref)
+                page.update(kid)
+                for attr, value in inherited.items():
+                    if attr not in page:
+                        page[NameObject(attr)] = value
+                return page
+            else:
+                index -= 1
+        else:
+            raise IndexError("page index out of range")
+
 def natural_sort_key(p: Path):
     # Simple natural-ish sort: split digits and text
-    import re
     return [int(t) if t.isdigit() else t.lower()
-            for t in re.findall(r"\d+|\D+", p.stem)]
+            for t in _NATURAL_RE.findall(p.stem)]
+
+# -------- Input discovery and metadata cache --------
+def _scan_dir(path):
+    """One os.scandir listing: ([(pdf path, size, mtime)], [subdirectories])."""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.path, st.st_size, st.st_mtime))
+                except OSError:
+                    continue  # vanished or unreadable entry
+    except OSError as e:
+        print(f"Warning: cannot list {path}: {e}", file=sys.stderr)
+    return files, dirs
+
+def scan_pdfs(root, recursive=False, threads=SCAN_THREADS):
+    """
+    PDFs under root as (path, size, mtime), sorted with natural_sort_key.
+    Subdirectories are listed concurrently; size/mtime come from the same scandir pass
+    and feed the metadata cache, so no file is opened or re-resolved here.
+    """
+    found = []
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = {pool.submit(_scan_dir, str(root))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                files, dirs = fut.result()
+                found.extend(files)
+                if recursive:
+                    pending |= {pool.submit(_scan_dir, d) for d in dirs}
+    # Sort keys are computed once per file; the path breaks ties so the order is stable across runs
+    keyed = [((natural_sort_key(Path(f)), f), (f, size, mtime)) for f, size, mtime in found]
+    keyed.sort(key=lambda item: item[0])
+    return [item for _, item in keyed]
+
+def probe_pdf(path, selections=(None,)):
+    """
+    Page count and validity of one PDF (what the metadata cache stores).
+    selections are the page ranges the merge will take from it (None = whole file).
+    Only those pages are resolved, with lazy_page; whole-file inputs get their first
+    and last page checked, which is enough to catch a broken or truncated page tree
+    without parsing every page ahead of the merge.
+    """
+    try:
+        with open(path, "rb") as fh:
+            reader = PdfReader(fh)
+            if reader.is_encrypted and not reader.decrypt(""):
+                return {"valid": False, "error": "encrypted", "pages": 0}
+            count = page_count(reader)
+            indices = set()
+            for ranges in selections:
+                if ranges is None:
+                    indices.update({0, count - 1} if count else ())
+                else:
+                    indices.update(select_page_indices(ranges, count))
+            for i in sorted(indices):
+                lazy_page(reader, i).mediabox
+        return {"valid": True, "pages": count}
+    except Exception as e:
+        return {"valid": False, "error": f"{type(e).__name__}: {e}", "pages": 0}
+
+def selection_key(selections):
+    """Canonical text for the page selections a file is probed with, e.g. '*' or '1-3,10|5-' ('*' = whole file)."""
+    parts = {"*" if ranges is None else ",".join(f"{a}-{'' if b is None else b}" for a, b in ranges)
+             for ranges in selections}
+    return "|".join(sorted(parts))
+
+def load_metadata_cache(cache_path):
+    """
+    Read the JSON-lines cache into {(path, size, mtime, selection): record}. Validity depends
+    on which pages were checked, so records are kept per selection_key; the last record for a
+    key wins. Records for an older (size, mtime) of a path are dropped, and when the file holds
+    such superseded or outdated lines it is rewritten, so it does not grow without bound.
+    """
+    records = {}
+    latest = {}  # path -> (size, mtime) of its last record
+    if not cache_path or not os.path.exists(cache_path):
+        return records
+    lines = 0
+    with open(cache_path, "r", encoding="utf-8") as f:
+        for line in f:
+            lines += 1
+            try:
+                rec = json.loads(line)
+                key = (rec["path"], rec["size"], rec["mtime"], rec["selection"])
+                records[key] = {k: rec[k] for k in ("path", "size", "mtime", "selection", "valid", "pages", "error")
+                                if k in rec}
+                latest[rec["path"]] = (rec["size"], rec["mtime"])
+            except (ValueError, KeyError, TypeError):
+                continue  # half-written line from an interrupted run, or an older cache format
+    records = {key: rec for key, rec in records.items() if latest[key[0]] == key[1:3]}
+    if lines > len(records):
+        _compact_cache(cache_path, records.values())
+    return records
+
+def _compact_cache(cache_path, records):
+    """Rewrite the cache atomically; a failure just leaves the old file in place."""
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as out:
+            for rec in records:
+                out.write(json.dumps(rec) + "\n")
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        print(f"Warning: cannot compact {cache_path}: {e}", file=sys.stderr)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+def probe_inputs(files, cache_path=None, jobs=1):
+    """
+    Metadata for each (path, size, mtime, selections). Unchanged files probed with the
+    same selections come from the cache; the rest are probed (in a process pool when jobs > 1) and appended to it.
+    Returns ({path: metadata}, cache hits).
+    """
+    cached = load_metadata_cache(cache_path)
+    meta = {}
+    misses = []
+    for path, size, mtime, selections in files:
+        rec = cached.get((str(path), size, mtime, selection_key(selections)))
+        if rec is not None:
+            meta[str(path)] = rec
+        else:
+            misses.append((str(path), size, mtime, selections))
+
+    if misses:
+        paths = [m[0] for m in misses]
+        selections = [m[3] for m in misses]
+        if jobs > 1 and len(misses) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(probe_pdf, paths, selections, chunksize=16))
+        else:
+            results = [probe_pdf(p, sel) for p, sel in zip(paths, selections)]
+
+        out = open(cache_path, "a", encoding="utf-8") if cache_path else None
+        try:
+            for (path, size, mtime, selections), result in zip(misses, results):
+                rec = {"path": path, "size": size, "mtime": mtime, "selection": selection_key(selections)}
+                rec.update(result)
+                meta[path] = rec
+                if out:
+                    out.write(json.dumps(rec) + "\n")
+        finally:
+            if out:
+                out.close()
+    return meta, len(files) - len(misses)
+
+def format_preview(ordered, meta, cache_hits):
+    """--dry-run listing: one line per input, then totals."""
+    lines = []
+    total_pages = 0
+    for path, ranges in ordered:
+        rec = meta[str(path)]
+        if not rec["valid"]:
+            lines.append(f"  BAD    {path}  ({rec['error']})")
+            continue
+        n = len(select_page_indices(ranges, rec["pages"])) if ranges else rec["pages"]
+        total_pages += n
+        lines.append(f"  {n:>5}  {path}" + (f"  ({rec['pages']} in file)" if ranges else ""))
+    lines.append(f"{len(ordered)} input(s), {total_pages} page(s) to merge; "
+                 f"metadata cache: {cache_hits} hit(s), {len(ordered) - cache_hits} parsed")
+    return "\n".join(lines)
 
 def add_page_preserve(writer: PdfWriter, page: PageObject):
     """Add page without changing size or orientation."""
     # Honor any rotation metadata as-is
     writer.add_page(page)
 
-def add_page_fitted(writer: PdfWriter, page: PageObject, target_w: float, target_h: float, force_landscape: bool):
-    """Fit a page into a target canvas, preserving aspect ratio, centered."""
+def page_matches_target(page: PageObject, tw: float, th: float, tol: float = 1.0) -> bool:
+    """True when fitting would not change the page: same size, origin at 0,0, no crop box, no rotation."""
+    box = page.mediabox
+    if abs(float(box.left)) > tol or abs(float(box.bottom)) > tol:
+        return False
+    if abs(float(box.width) - tw) > tol or abs(float(box.height) - th) > tol:
+        return False
+    if page.get("/Rotate", 0) % 360:
+        return False
+    return "/CropBox" not in page or list(page.cropbox) == list(box)
+
+def fit_page(page: PageObject, target_w: float, target_h: float, force_landscape: bool) -> PageObject:
+    """Return a new page of the target size with the source page scaled to fit, centered."""
     src_w = float(page.mediabox.width)
     src_h = float(page.mediabox.height)
 
     # Optionally flip target to landscape
     tw, th = (max(target_w, target_h), min(target_w, target_h)) if force_landscape else (target_w, target_h)
 
+    # Fast path: already the right size and orientation, the transform would be an identity
+    if page_matches_target(page, tw, th):
+        return page
+
     new_page = PageObject.create_blank_page(width=tw, height=th)
 
     # Scale to fit while preserving aspect ratio
@@ -46,80 +321,492 @@ def add_page_fitted(writer: PdfWriter, page: PageObject, target_w: float, target
     # Build a transformation: scale then translate
     op = Transformation().scale(scale).translate(tx, ty)
     new_page.merge_transformed_page(page, op, expand=False)
+    return new_page
+
+def add_page_fitted(writer: PdfWriter, page: PageObject, target_w: float, target_h: float, force_landscape: bool):
+    """Fit a page into a target canvas, preserving aspect ratio, centered."""
+    writer.add_page(fit_page(page, target_w, target_h, force_landscape))
+
+class StreamingPdfWriter:
+    """
+    Append-only PDF writer for very large merges.
+
+    Each added page, and every object it references, is serialized to the output file
+    immediately; only the xref offsets and the list of page object numbers stay in memory.
+    Together with reading one input at a time this keeps memory flat no matter how many
+    files are merged. Object numbers 1 and 2 are reserved for the catalog and page tree,
+    which close() writes once all pages are known.
+
+    dedup=True hashes every copied object (streams such as fonts, images, ICC profiles
+    and form XObjects, plus the small dictionaries around them) after its references
+    have been renumbered, and reuses the first copy when identical content shows up
+    again in any later input. Only a digest per unique object is kept.
+    """
+
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self, fp, dedup=False):
+        self.fp = fp
+        self.dedup = dedup
+        self.dedup_hits = 0
+        self.dedup_saved = 0
+        self._digests = {}       # content digest -> object number, across all sources
+        self._in_progress = set()  # keys of objects whose children are being written (the current path)
+        self.offsets = {}        # object number -> byte offset
+        self.kids = []           # page object numbers, in order
+        self.next_num = 3
+        self._refs = {}          # (idnum, generation) in the current source -> object number
+        self._source_pages = {}  # (idnum, generation) of pages the current source will contribute
+        self._todo = []          # (object number, source object) waiting to be written
+        fp.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def stats(self):
+        return {"pages": len(self.kids), "objects": len(self.offsets),
+                "dedup_hits": self.dedup_hits, "dedup_saved": self.dedup_saved}
+
+    def begin_source(self, pages):
+        """
+        Start copying from a new reader. pages are the pages that will be added from it, so
+        links between them survive while references to pages that are left out become null.
+        Object numbers from the previous source are forgotten here, which is what keeps
+        memory bounded.
+        """
+        self._refs = {}
+        self._source_pages = {}
+        for page in pages:
+            ref = page.indirect_reference
+            if ref is not None:
+                key = (ref.idnum, ref.generation)
+                self._refs[key] = self._source_pages[key] = self._alloc()
+
+    def add_page(self, page: PageObject):
+        ref = page.indirect_reference
+        key = (ref.idnum, ref.generation) if ref is not None else None
+        num = self._source_pages.get(key) if key else None
+        if num is None or num in self.offsets:
+            # Not reserved, or a page selected more than once: every copy is its own object
+            num = self._alloc()
+        self.kids.append(num)
+
+        page_dict = self._remap_dict(page, drop_parent=True)
+        page_dict[NameObject("/Parent")] = IndirectObject(self.PAGES, 0, None)
+        self._write(num, page_dict)
+        self._drain()
+
+    def close(self):
+        """Write the page tree, catalog, xref table and trailer."""
+        kids = ArrayObject(IndirectObject(n, 0, None) for n in self.kids)
+        self._write(self.PAGES, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): kids,
+            NameObject("/Count"): NumberObject(len(self.kids)),
+        }))
+        self._write(self.CATALOG, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(self.PAGES, 0, None),
+        }))
+
+        xref_pos = self.fp.tell()
+        self.fp.write(b"xref\n0 %d\n" % self.next_num)
+        self.fp.write(b"0000000000 65535 f \n")
+        for num in range(1, self.next_num):
+            if num in self.offsets:
+                self.fp.write(b"%010d 00000 n \n" % self.offsets[num])
+            else:
+                self.fp.write(b"0000000000 65535 f \n")
+        self.fp.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                      % (self.next_num, self.CATALOG, xref_pos))
+
+    # ---- internals ----
+    def _alloc(self):
+        num = self.next_num
+        self.next_num += 1
+        return num
+
+    def _ref(self, ind: IndirectObject):
+        key = (ind.idnum, ind.generation)
+        num = self._refs.get(key)
+        if num is None and key in self._in_progress:
+            # Reference cycle back to an object being hashed: pin its number, it won't be deduplicated
+            num = self._refs[key] = self._alloc()
+        if num is None:
+            obj = ind.get_object()
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages"):
+                # A link to a page (or page tree) that is not part of the output
+                return NullObject()
+            if self.dedup and self._dedup_eligible(obj):
+                num = self._write_dedup(key, obj)
+            else:
+                num = self._refs[key] = self._alloc()
+                self._todo.append((num, obj))
+        return IndirectObject(num, 0, None)
+
+    @staticmethod
+    def _dedup_eligible(obj):
+        # Annotations (anything with a /Rect) belong to one page and must stay distinct
+        return not (isinstance(obj, DictionaryObject) and "/Rect" in obj)
 
-    writer.add_page(new_page)
+    def _write_dedup(self, key, obj):
+        """
+        Write obj after its children (post-order) unless identical content was already written.
+        The reference graph is walked with an explicit stack, so long reference chains cannot
+        exhaust the Python stack: an object is serialised only once every child it refers to
+        has an output number, which keeps _build from recursing into further objects.
+        """
+        stack = [(key, obj)]
+        while stack:
+            key, obj = stack[-1]
+            if key in self._refs and key not in self._in_progress:
+                stack.pop()  # finished through another path since it was pushed
+                continue
+            if key not in self._in_progress:
+                self._in_progress.add(key)
+                for child_key, child in self._pending_children(obj):
+                    if child_key in self._in_progress:
+                        # Reference cycle back to an ancestor: pin its number, it won't be deduplicated
+                        self._refs[child_key] = self._alloc()
+                    else:
+                        stack.append((child_key, child))
+                continue
+
+            buf = BytesIO()
+            self._build(obj).write_to_stream(buf)
+            data = buf.getvalue()
+            self._in_progress.discard(key)
+            stack.pop()
+
+            pinned = self._refs.get(key)
+            if pinned is not None:
+                self._write_raw(pinned, data)
+                continue
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+            num = self._digests.get(digest)
+            if num is not None:
+                self.dedup_hits += 1
+                self.dedup_saved += len(data)
+            else:
+                num = self._digests[digest] = self._alloc()
+                self._write_raw(num, data)
+            self._refs[key] = num
+        return self._refs[key]
+
+    def _pending_children(self, obj):
+        """
+        (key, object) for each indirect reference _build(obj) will follow into _write_dedup:
+        not yet numbered, not a page, dedup-eligible. Mirrors the keys _build and _remap skip.
+        """
+        if isinstance(obj, StreamObject):
+            skip = ("/Length", "/Filter", "/DecodeParms") if isinstance(obj, ContentStream) else ("/Length",)
+            values = [v for k, v in obj.items() if k not in skip]
+        elif isinstance(obj, DictionaryObject):
+            values = [obj]
+        elif isinstance(obj, ArrayObject):
+            values = [obj]
+        else:
+            return []
+        found = []
+        seen = set()
+        while values:
+            value = values.pop()
+            if isinstance(value, IndirectObject):
+                key = (value.idnum, value.generation)
+                if key in self._refs or key in seen:
+                    continue
+                seen.add(key)
+                target = value.get_object()
+                if isinstance(target, DictionaryObject) and target.get("/Type") in ("/Page", "/Pages"):
+                    continue
+                if self._dedup_eligible(target):
+                    found.append((key, target))
+            elif isinstance(value, StreamObject):
+                continue  # direct stream: written via _todo, its children are reached from there
+            elif isinstance(value, DictionaryObject):
+                is_tree_node = value.get("/Type") in ("/Page", "/Pages")
+                values.extend(v for k, v in value.items() if not (k == "/Parent" and is_tree_node))
+            elif isinstance(value, ArrayObject):
+                values.extend(value)
+        found.reverse()  # stack order: first reference is written first
+        return found
+
+    def _remap(self, obj):
+        """Copy a direct object, rewriting indirect references to output object numbers."""
+        if isinstance(obj, IndirectObject):
+            return self._ref(obj)
+        if isinstance(obj, StreamObject):
+            # Streams must be indirect; direct ones come from pages built in memory (e.g. fit_page)
+            num = self._alloc()
+            self._todo.append((num, obj))
+            return IndirectObject(num, 0, None)
+        if isinstance(obj, DictionaryObject):
+            return self._remap_dict(obj)
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._remap(v) for v in obj)
+        return obj
+
+    def _remap_dict(self, obj, drop_parent=False):
+        out = DictionaryObject()
+        is_tree_node = drop_parent or obj.get("/Type") in ("/Page", "/Pages")
+        for k, v in obj.items():
+            if k == "/Parent" and is_tree_node:
+                continue
+            out[NameObject(k)] = self._remap(v)
+        return out
+
+    def _stream_copy(self, obj: StreamObject):
+        out = StreamObject()
+        if isinstance(obj, ContentStream):
+            # In-memory content streams hold decoded data (or parsed operations)
+            out._data = obj.get_data()
+            items = ((k, v) for k, v in obj.items() if k not in ("/Filter", "/DecodeParms"))
+        else:
+            out._data = obj._data  # still encoded exactly as in the source file
+            items = obj.items()
+        for k, v in items:
+            if k != "/Length":
+                out[NameObject(k)] = self._remap(v)
+        return out
+
+    def _build(self, obj):
+        """The output version of a source object, with references renumbered."""
+        if isinstance(obj, StreamObject):
+            return self._stream_copy(obj)
+        if isinstance(obj, DictionaryObject):
+            return self._remap_dict(obj)
+        return self._remap(obj)
+
+    def _write(self, num, obj):
+        buf = BytesIO()
+        obj.write_to_stream(buf)
+        self._write_raw(num, buf.getvalue())
+
+    def _write_raw(self, num, data):
+        self.offsets[num] = self.fp.tell()
+        self.fp.write(b"%d 0 obj\n" % num)
+        self.fp.write(data)
+        self.fp.write(b"\nendobj\n")
+
+    def _drain(self):
+        while self._todo:
+            num, obj = self._todo.pop()
+            self._write(num, self._build(obj))
 
 def merge_pdfs(
     inputs,
     output,
     recursive=False,
     normalize=None,
-    landscape=False
+    landscape=False,
+    streaming=False,
+    dedup=False,
+    jobs=1,
+    pages=None,
+    cache=None,
+    validate=True,
+    dry_run=False,
+    skip_bad=False,
+    log=print
 ):
+    """
+    Merge PDFs into output.
+    streaming=True writes pages as they are read and keeps only one input open,
+    so memory stays flat for merges of thousands of files.
+    dedup=True (implies streaming) stores identical fonts/images/other objects once.
+    jobs>1 runs --normalize page fitting in that many worker processes.
+    pages is a page selection like "1-3,10" for every input; an input can carry its own
+    as "file.pdf[1-3,10]". Only the selected pages are loaded from those files.
+    validate=True checks every input (opens, page count, selected pages resolve) before
+    writing and stops on unreadable ones unless skip_bad; cache is a JSON-lines file that remembers
+    those results by (path, size, mtime). dry_run=True only logs the preview.
+    Returns the streaming writer's stats, or None for the classic merge.
+    """
+    # Determine normalization target if requested
+    target = None
+    if normalize:
+        key = normalize.upper()
+        if key not in SIZES:
+            raise SystemExit(f"Unknown size '{normalize}'. Choose from: {', '.join(SIZES.keys())}")
+        target = SIZES[key]
+
+    # (path, page ranges or None, size, mtime); a per-input [..] selector wins over the global pages rule
+    default_ranges = parse_page_ranges(pages) if pages else None
     files = []
     for inp in inputs:
+        inp, ranges = split_selector(inp)
+        ranges = ranges or default_ranges
         p = Path(inp)
         if p.is_dir():
-            pattern = "**/*.pdf" if recursive else "*.pdf"
-            files.extend(sorted([Path(f) for f in glob.glob(str(p / pattern), recursive=recursive)], key=natural_sort_key))
-        else:
-            files.append(p)
+            # Resolve the folder once; scanned paths are built under it
+            files.extend((Path(f), ranges, size, mtime) for f, size, mtime in scan_pdfs(p.resolve(), recursive))
+        elif p.suffix.lower() == ".pdf" and p.exists():
+            st = p.stat()
+            files.append((p.resolve(), ranges, st.st_size, st.st_mtime))
 
     # Deduplicate and keep stable order
     seen = set()
     ordered = []
-    for f in files:
-        if f.suffix.lower() == ".pdf":
-            rp = f.resolve()
-            if rp not in seen and rp.exists():
-                seen.add(rp)
-                ordered.append(rp)
+    stats = []
+    for f, ranges, size, mtime in files:
+        if (f, ranges) not in seen:
+            seen.add((f, ranges))
+            ordered.append((f, ranges))
+            stats.append((f, size, mtime))
 
     if not ordered:
         raise SystemExit("No PDF files found.")
 
-    writer = PdfWriter()
-
-    # Determine normalization target if requested
-    target = None
-    if normalize:
-        key = normalize.upper()
-        if key not in SIZES:
-            raise SystemExit(f"Unknown size '{normalize}'. Choose from: {', '.join(SIZES.keys())}")
-        target = SIZES[key]
-
-    for f in ordered:
-        reader = PdfReader(str(f))
-        for page in reader.pages:
-            if target is None:
-                add_page_preserve(writer, page)
-            else:
-                add_page_fitted(writer, page, target_w=target[0], target_h=target[1], force_landscape=landscape)
+    # Check every input before anything is written
+    if validate or dry_run:
+        selections = {}
+        for f, ranges in ordered:
+            selections.setdefault(f, []).append(ranges)
+        unique = {f: (f, size, mtime, tuple(selections[f])) for f, size, mtime in stats}
+        meta, cache_hits = probe_inputs(list(unique.values()), cache_path=cache, jobs=jobs)
+        if dry_run:
+            log(format_preview(ordered, meta, cache_hits))
+            return None
+        bad = [f for f, _ in ordered if not meta[str(f)]["valid"]]
+        if bad:
+            for f in bad:
+                print(f"Bad input: {f} ({meta[str(f)]['error']})", file=sys.stderr)
+            if not skip_bad:
+                raise SystemExit(f"{len(bad)} unreadable PDF(s); nothing written. Use --skip-bad to merge the rest.")
+            ordered = [(f, ranges) for f, ranges in ordered if meta[str(f)]["valid"]]
+            if not ordered:
+                raise SystemExit("No readable PDF files found.")
 
     # Ensure output directory exists
     out_path = Path(output)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_path, "wb") as fp:
+
+    if target is not None and jobs > 1 and len(ordered) > 1:
+        return _merge_normalized_parallel(ordered, out_path, target, landscape, streaming, dedup, jobs)
+    return _write_merged(ordered, out_path, target, landscape, streaming, dedup)
+
+def _source_pages(path, ranges, stack):
+    """Pages to take from one input. Selections are read lazily from an open file handle."""
+    if ranges is None:
+        reader = PdfReader(str(path))
+        if reader.is_encrypted:
+            reader.decrypt("")
+        return list(reader.pages)
+    # Without a selection pypdf reads the whole file up front; here objects are read on demand
+    reader = PdfReader(stack.enter_context(open(path, "rb")))
+    if reader.is_encrypted:
+        reader.decrypt("")
+    return [lazy_page(reader, i) for i in select_page_indices(ranges, page_count(reader))]
+
+@contextmanager
+def _replace_on_success(out_path):
+    """
+    Binary file to write out_path through: a temp file next to it that replaces out_path only
+    once the block finishes, so a failed merge leaves neither a truncated PDF nor a clobbered file.
+    """
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as fp:
+            yield fp
+        os.replace(tmp, out_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def _write_merged(entries, out_path, target=None, landscape=False, streaming=False, dedup=False):
+    """Append the pages of entries, (path, page ranges or None) pairs, into out_path (fitted to target if given)."""
+    if streaming or dedup:
+        # One reader at a time; pages go straight to disk
+        with _replace_on_success(out_path) as fp:
+            writer = StreamingPdfWriter(fp, dedup=dedup)
+            for f, ranges in entries:
+                with ExitStack() as stack:
+                    pages = _source_pages(f, ranges, stack)
+                    writer.begin_source(pages)
+                    for page in pages:
+                        if target is not None:
+                            page = fit_page(page, target_w=target[0], target_h=target[1], force_landscape=landscape)
+                        writer.add_page(page)
+                    del pages
+            writer.close()
+        return writer.stats()
+
+    writer = PdfWriter()
+
+    for f, ranges in entries:
+        # add_page deep-copies the page, so each input can be closed right away
+        with ExitStack() as stack:
+            for page in _source_pages(f, ranges, stack):
+                if target is None:
+                    add_page_preserve(writer, page)
+                else:
+                    add_page_fitted(writer, page, target_w=target[0], target_h=target[1], force_landscape=landscape)
+
+    with _replace_on_success(out_path) as fp:
         writer.write(fp)
 
+def _normalize_slice(entries, out_path, target, landscape):
+    """Pool worker: fit one contiguous slice of the inputs into an intermediate PDF."""
+    _write_merged(entries, out_path, target, landscape, streaming=True)
+    return out_path
+
+def _merge_normalized_parallel(ordered, out_path, target, landscape, streaming, dedup, jobs):
+    """
+    Run the page fitting (pure-Python content-stream rewriting) across a process pool.
+    Inputs are cut into contiguous slices, a few per worker so uneven files balance out;
+    each worker writes a normalized intermediate, and the intermediates are then
+    concatenated in slice order, which keeps the natural_sort_key order of the inputs.
+    """
+    n_slices = min(len(ordered), jobs * 4)
+    size = -(-len(ordered) // n_slices)
+    slices = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+    with tempfile.TemporaryDirectory(prefix="pdfmerger_") as tmp:
+        parts = [os.path.join(tmp, f"part_{i:05d}.pdf") for i in range(len(slices))]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(_normalize_slice, slices, parts, [target] * len(slices), [landscape] * len(slices)))
+        return _write_merged([(part, None) for part in parts], out_path, streaming=streaming, dedup=dedup)
+
 def main():
     parser = argparse.ArgumentParser(
         description="Merge/append PDFs of any size/orientation; optionally normalize to A4/Letter."
     )
-    parser.add_argument("inputs", nargs="+", help="PDF files and/or folders (folders will be scanned for PDFs).")
-    parser.add_argument("-o", "--output", required=True, help="Output PDF path, e.g., merged.pdf")
+    parser.add_argument("inputs", nargs="+",
+                        help="PDF files and/or folders (folders will be scanned for PDFs). "
+                             "Append a page selection to pick pages, e.g. report.pdf[1-3,10] or scans[1].")
+    parser.add_argument("-o", "--output", help="Output PDF path, e.g., merged.pdf (required unless --dry-run)")
     parser.add_argument("-r", "--recursive", action="store_true", help="Recurse into subfolders when a folder is given.")
     parser.add_argument("--normalize", choices=["A4", "LETTER"], help="Fit every page into this canvas size.")
     parser.add_argument("--landscape", action="store_true", help="When --normalize is set, make the target canvas landscape.")
+    parser.add_argument("--streaming", action="store_true", help="Constant-memory merge: write pages as they are read (for very many inputs).")
+    parser.add_argument("--pages", help="Pages to take from every input without its own [..] selection, e.g. 1-3,10 or 5-.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes for --normalize and input checks (default 1).")
+    parser.add_argument("--dry-run", action="store_true", help="List inputs with page counts, report bad files, write nothing.")
+    parser.add_argument("--skip-bad", action="store_true", help="Leave out unreadable inputs instead of stopping.")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE), help=f"Input metadata cache (default: {DEFAULT_CACHE}).")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the metadata cache.")
+    parser.add_argument("--dedup", action="store_true", help="Store identical fonts/images/objects from different inputs once (implies --streaming).")
     args = parser.parse_args()
+    if not args.output and not args.dry_run:
+        parser.error("-o/--output is required")
 
-    merge_pdfs(
+    stats = merge_pdfs(
         inputs=args.inputs,
         output=args.output,
         recursive=args.recursive,
         normalize=args.normalize,
-        landscape=args.landscape
+        landscape=args.landscape,
+        streaming=args.streaming,
+        dedup=args.dedup,
+        jobs=args.jobs,
+        pages=args.pages,
+        cache=None if args.no_cache else args.cache,
+        dry_run=args.dry_run,
+        skip_bad=args.skip_bad
     )
+    if stats and args.dedup:
+        print(f"Deduplicated {stats['dedup_hits']} object(s), saved {stats['dedup_saved'] / 1024 / 1024:.2f} MB")
 
 if __name__ == "__main__":
     main()